@@ -1,12 +1,23 @@
 import cv2
-import numpy as np
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+import queue
 import threading
+from collections import OrderedDict
 from PIL import Image, ImageTk
+import os
+from vtr import (ALGORITHMS, AUTO, DEFAULT_ALGORITHM, DEFAULT_CACHE_SIZE, DETECTORS,
+                 INPAINT_RADIUS, PROJECT_EXT, PYRAMID_SCALE, SAMPLE_SECONDS, TRACKERS,
+                 FramePipeline, FrameServer, InpaintEngine, JobManager, JobSpec, Mask, Project,
+                 ProjectError, Telemetry, VideoError, canvas_to_video, check_quality, detect_text,
+                 format_progress, format_stages, format_summary, load_index, normalize_rect,
+                 resolve_algorithm, track_mask, video_to_canvas)
 
 class VideoTextRemover:
     HANDLE_SIZE = 8
+    PREVIEW_CACHE_SIZE = 16
+    UI_POLL_MS = 100
+    UI_PROGRESS_INTERVAL = 0.1
     ACCENT_COLOR = "#4a6fa5"
     DARK_BG = "#2d2d2d"
     LIGHT_BG = "#3a3a3a"
@@ -42,6 +53,9 @@ class VideoTextRemover:
         
         # Internal state
         self.initialize_state()
+        
+        # Worker threads post to ui_queue; only the Tk thread touches widgets
+        self.root.after(self.UI_POLL_MS, self.poll_ui_queue)
 
     def configure_styles(self):
         style = ttk.Style()
@@ -143,6 +157,13 @@ class VideoTextRemover:
         ttk.Button(load_frame, text='Load Video', style='Accent.TButton',
                   command=self.load_video).pack(fill='x', padx=5, pady=5)
         
+        # Masks, settings and cached analysis, saved next to the video
+        project_btns = ttk.Frame(load_frame)
+        project_btns.pack(fill='x', padx=5, pady=(0, 5))
+        
+        ttk.Button(project_btns, text='Open Project...', command=self.open_project).pack(side='left', expand=True)
+        ttk.Button(project_btns, text='Save Project...', command=self.save_project).pack(side='left', expand=True)
+        
         # Video info
         self.video_info = ttk.Label(load_frame, text="No video loaded", style='Accent.TLabel')
         self.video_info.pack(pady=(0, 5))
@@ -187,6 +208,42 @@ class VideoTextRemover:
         ttk.Button(btn_frame2, text='Delete', command=self.delete_selected).pack(side='left', expand=True)
         ttk.Button(btn_frame2, text='Clear All', command=self.clear_all).pack(side='left', expand=True)
         
+        # Frame range of the selected mask, set from the frame navigator
+        time_frame = ttk.LabelFrame(mask_tab, text=' Time Range ')
+        time_frame.pack(fill='x', padx=5, pady=5)
+        
+        btn_frame3 = ttk.Frame(time_frame)
+        btn_frame3.pack(fill='x', padx=5, pady=5)
+        
+        ttk.Button(btn_frame3, text='Start Here', command=self.set_mask_start).pack(side='left', expand=True)
+        ttk.Button(btn_frame3, text='End Here', command=self.set_mask_end).pack(side='left', expand=True)
+        
+        btn_frame4 = ttk.Frame(time_frame)
+        btn_frame4.pack(fill='x', padx=5, pady=(0, 5))
+        
+        ttk.Button(btn_frame4, text='Keyframe', command=self.add_keyframe).pack(side='left', expand=True)
+        ttk.Button(btn_frame4, text='All Frames', command=self.reset_mask_range).pack(side='left', expand=True)
+        
+        # Follows the selected mask's text forward and backward from this frame
+        track_frame = ttk.LabelFrame(mask_tab, text=' Track Mask ')
+        track_frame.pack(fill='x', padx=5, pady=5)
+        
+        self.track_method_var = tk.StringVar(value='template')
+        ttk.Combobox(track_frame, textvariable=self.track_method_var, state='readonly',
+                    values=list(TRACKERS)).pack(fill='x', padx=5, pady=5)
+        ttk.Button(track_frame, text='Track Selected Mask',
+                  command=self.track_selected_mask).pack(fill='x', padx=5, pady=(0, 5))
+        
+        # Automatic text detection on sampled frames
+        detect_frame = ttk.LabelFrame(mask_tab, text=' Detect Text ')
+        detect_frame.pack(fill='x', padx=5, pady=5)
+        
+        self.detect_method_var = tk.StringVar(value='auto')
+        ttk.Combobox(detect_frame, textvariable=self.detect_method_var, state='readonly',
+                    values=list(DETECTORS)).pack(fill='x', padx=5, pady=5)
+        ttk.Button(detect_frame, text='Detect Text Regions',
+                  command=self.detect_masks).pack(fill='x', padx=5, pady=(0, 5))
+        
         # Mask list
         list_frame = ttk.LabelFrame(mask_tab, text=' Mask List ')
         list_frame.pack(fill='both', expand=True, padx=5, pady=5)
@@ -209,6 +266,62 @@ class VideoTextRemover:
         ttk.Combobox(out_frame, textvariable=self.format_var, 
                     values=['MP4', 'AVI', 'MOV']).pack(fill='x', padx=5, pady=(0, 5))
         
+        ttk.Label(out_frame, text='Inpaint Mode:').pack(anchor='w', padx=5)
+        self.inpaint_mode_var = tk.StringVar(value='roi')
+        ttk.Combobox(out_frame, textvariable=self.inpaint_mode_var, state='readonly',
+                    values=list(InpaintEngine.MODES)).pack(fill='x', padx=5, pady=(0, 5))
+        
+        ttk.Label(out_frame, text='Algorithm (auto = fastest that matches TELEA):').pack(anchor='w', padx=5)
+        self.algorithm_var = tk.StringVar(value=DEFAULT_ALGORITHM)
+        ttk.Combobox(out_frame, textvariable=self.algorithm_var, state='readonly',
+                    values=list(ALGORITHMS) + [AUTO]).pack(fill='x', padx=5, pady=(0, 5))
+        
+        ttk.Label(out_frame, text='Radius:').pack(anchor='w', padx=5)
+        self.radius_var = tk.IntVar(value=INPAINT_RADIUS)
+        ttk.Spinbox(out_frame, from_=1, to=50, textvariable=self.radius_var).pack(fill='x', padx=5, pady=(0, 5))
+        
+        ttk.Label(out_frame, text='Workers:').pack(anchor='w', padx=5)
+        self.workers_var = tk.IntVar(value=os.cpu_count() or 1)
+        ttk.Spinbox(out_frame, from_=1, to=256, textvariable=self.workers_var).pack(fill='x', padx=5, pady=(0, 5))
+        
+        ttk.Label(out_frame, text='Worker Type:').pack(anchor='w', padx=5)
+        self.backend_var = tk.StringVar(value='thread')
+        ttk.Combobox(out_frame, textvariable=self.backend_var, state='readonly',
+                    values=list(FramePipeline.BACKENDS)).pack(fill='x', padx=5, pady=(0, 5))
+        
+        # Caps the decoded frames each job keeps in flight
+        ttk.Label(out_frame, text='Frame Memory Limit, MB (0 = no limit):').pack(anchor='w', padx=5)
+        self.max_memory_var = tk.IntVar(value=0)
+        ttk.Spinbox(out_frame, from_=0, to=65536, increment=256, textvariable=self.max_memory_var).pack(fill='x', padx=5, pady=(0, 5))
+        
+        ttk.Label(out_frame, text='Inpaint Cache Size (0 = off):').pack(anchor='w', padx=5)
+        self.cache_size_var = tk.IntVar(value=DEFAULT_CACHE_SIZE)
+        ttk.Spinbox(out_frame, from_=0, to=4096, textvariable=self.cache_size_var).pack(fill='x', padx=5, pady=(0, 5))
+        
+        ttk.Label(out_frame, text='Pyramid Scale (pyramid mode, 1 = full resolution):').pack(anchor='w', padx=5)
+        self.pyramid_scale_var = tk.DoubleVar(value=PYRAMID_SCALE)
+        ttk.Spinbox(out_frame, from_=0.1, to=1.0, increment=0.05,
+                   textvariable=self.pyramid_scale_var).pack(fill='x', padx=5, pady=(0, 5))
+        
+        ttk.Button(out_frame, text='Check Quality',
+                  command=self.check_quality).pack(fill='x', padx=5, pady=(0, 5))
+        
+        self.smart_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(out_frame, text='Smart render (re-encode masked GOPs only, needs ffmpeg)',
+                        variable=self.smart_var).pack(anchor='w', padx=5, pady=(0, 5))
+        
+        self.resume_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(out_frame, text='Resumable (retrying continues after the last saved part, needs ffmpeg)',
+                        variable=self.resume_var).pack(anchor='w', padx=5, pady=(0, 5))
+        
+        # Per-stage histograms in the log when a job ends; the files go next to the output
+        self.telemetry_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(out_frame, text='Record telemetry (per-frame trace in OUTPUT.trace.jsonl)',
+                        variable=self.telemetry_var).pack(anchor='w', padx=5, pady=(0, 5))
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(out_frame, text='Profile (cProfile stats in OUTPUT.prof, slower)',
+                        variable=self.profile_var).pack(anchor='w', padx=5, pady=(0, 5))
+        
         # Processing buttons
         btn_frame = ttk.Frame(process_tab)
         btn_frame.pack(fill='x', padx=5, pady=5)
@@ -216,9 +329,34 @@ class VideoTextRemover:
         ttk.Button(btn_frame, text='Process Video', style='Accent.TButton',
                   command=self.remove_text).pack(fill='x', padx=5, pady=5)
         
+        ttk.Button(btn_frame, text='Queue Videos...',
+                  command=self.queue_videos).pack(fill='x', padx=5, pady=(0, 5))
+        
         ttk.Button(btn_frame, text='Cancel Processing', 
                   command=self.cancel_processing).pack(fill='x', padx=5, pady=(0, 5))
         
+        # Job queue
+        jobs_frame = ttk.LabelFrame(process_tab, text=' Jobs ')
+        jobs_frame.pack(fill='x', padx=5, pady=5)
+        
+        ttk.Label(jobs_frame, text='Concurrent Jobs:').pack(anchor='w', padx=5)
+        self.concurrency_var = tk.IntVar(value=1)
+        ttk.Spinbox(jobs_frame, from_=1, to=64, textvariable=self.concurrency_var,
+                   command=self.set_concurrency).pack(fill='x', padx=5, pady=(0, 5))
+        
+        self.job_tree = ttk.Treeview(jobs_frame, columns=('video', 'status', 'progress'),
+                                     show='headings', height=5, selectmode='browse')
+        for col, width in (('video', 140), ('status', 70), ('progress', 90)):
+            self.job_tree.heading(col, text=col.title())
+            self.job_tree.column(col, width=width, stretch=(col == 'video'))
+        self.job_tree.pack(fill='x', padx=5, pady=5)
+        
+        job_btns = ttk.Frame(jobs_frame)
+        job_btns.pack(fill='x', padx=5, pady=(0, 5))
+        ttk.Button(job_btns, text='Cancel Job', command=self.cancel_job).pack(side='left', expand=True, fill='x')
+        ttk.Button(job_btns, text='Retry Job', command=self.retry_job).pack(side='left', expand=True, fill='x')
+        ttk.Button(job_btns, text='Clear Finished', command=self.clear_finished_jobs).pack(side='left', expand=True, fill='x')
+        
         # Progress
         prog_frame = ttk.LabelFrame(process_tab, text=' Progress ')
         prog_frame.pack(fill='x', padx=5, pady=5)
@@ -255,17 +393,31 @@ class VideoTextRemover:
 
     def initialize_state(self):
         self.rectangles = []
+        # Per-mask frame range and keyframes, parallel to self.rectangles
+        self.mask_times = []
         self.undo_stack = []
         self.redo_stack = []
         self.selected_idx = None
         self.drawing = self.dragging = self.resizing = False
         self.start_x = self.start_y = self.handle_idx = None
-        self.cap = None
+        self.frames = None
         self.frame = None
         self.video_path = None
+        self.project = None
         self.total_frames = 0
-        self.cancel_requested = False
+        self.current_idx = 0
         self.photo = None
+        # Canvas items are created once and moved with coords() afterwards
+        self.image_item = None
+        self.rect_items = []
+        self.handle_items = []
+        self.draft_item = None
+        self.list_labels = []
+        # Scaled previews keyed by (frame index, canvas width, canvas height)
+        self.preview_cache = OrderedDict()
+        self.ui_queue = queue.Queue()
+        # Jobs run on their own threads; the listener only hands events to ui_queue
+        self.jobs = JobManager(listener=lambda job, event: self.ui_queue.put(('job', (job, event))))
 
     def log_msg(self, msg):
         self.log.config(state='normal')
@@ -274,123 +426,401 @@ class VideoTextRemover:
         self.log.config(state='disabled')
         self.canvas_status_label.config(text=msg)
 
+    def poll_ui_queue(self):
+        try:
+            while True:
+                kind, payload = self.ui_queue.get_nowait()
+                if kind == 'log':
+                    self.log_msg(payload)
+                elif kind == 'job':
+                    self.on_job_event(*payload)
+                elif kind == 'detected':
+                    self.add_detected_masks(*payload)
+                elif kind == 'tracked':
+                    self.apply_tracked_mask(*payload)
+                elif kind == 'index':
+                    self.apply_index(*payload)
+        except queue.Empty:
+            pass
+        self.root.after(self.UI_POLL_MS, self.poll_ui_queue)
+
+    def show_progress(self, snap):
+        self.progress_var.set(snap['percent'])
+        text = format_progress(snap)
+        stages = format_stages(snap)
+        self.progress_label.config(text=f'{text}\n{stages}' if stages else text)
+
+    def on_job_event(self, job, event):
+        name = os.path.basename(job.spec.src)
+        if event == 'progress':
+            self.show_progress(job.progress)
+            self.update_job_row(job)
+            return
+        self.update_job_row(job)
+        if event == 'algorithm':
+            for c in job.algorithm_report:
+                if c.get('skipped'):
+                    note = 'skipped, slower than the best'
+                elif c['psnr'] is None:
+                    note = 'reference'
+                else:
+                    note = f"PSNR {c['psnr']} dB"
+                self.log_msg(f"[{job.id}] {c['algorithm']}: {c['ms']} ms/frame, {note}"
+                             f"{' (chosen)' if c['chosen'] else ''}")
+            return
+        if job.status == 'running':
+            self.log_msg(f'[{job.id}] Processing {name} (attempt {job.attempts})')
+        elif job.status == 'failed':
+            self.log_msg(f'[{job.id}] Processing failed: {job.error}')
+        elif job.status == 'cancelled':
+            self.log_msg(f'[{job.id}] Processing cancelled by user')
+        elif job.status == 'done':
+            result = job.result
+            self.log_msg(f'[{job.id}] {result.passed_through} of {result.frames} frames had no active mask')
+            if 'cache_hits' in result.stats:
+                self.log_msg(f"[{job.id}] Inpaint cache: {result.stats['cache_hits']} hits, "
+                             f"{result.stats['cache_misses']} misses")
+            if result.timing:
+                self.log_msg(f"[{job.id}] {result.timing['fps']:.1f} fps over "
+                             f"{result.timing['elapsed']:.1f}s; {format_stages(result.timing)}")
+            if result.peak_rss_mb is not None:
+                self.log_msg(f'[{job.id}] Peak memory (RSS): {result.peak_rss_mb:.0f} MB')
+            telemetry = job.spec.options.get('telemetry')
+            if telemetry:
+                for line in format_summary(telemetry.summary()):
+                    self.log_msg(f'[{job.id}] {line}')
+            self.log_msg(f'[{job.id}] Processing complete. Saved to: {job.spec.dst}')
+        if job.finished and not self.jobs.active:
+            jobs = self.jobs.jobs()
+            done = sum(j.status == 'done' for j in jobs)
+            if done == len(jobs):
+                messagebox.showinfo('Success', 'Video processing completed successfully')
+            elif done:
+                self.log_msg(f'Queue finished: {done} of {len(jobs)} jobs completed')
+
+    def update_job_row(self, job):
+        snap = job.progress
+        progress = f"{int(snap['percent'])}% {snap['fps']:.0f} fps" if snap else ''
+        values = (os.path.basename(job.spec.src), job.status, progress)
+        iid = str(job.id)
+        if self.job_tree.exists(iid):
+            self.job_tree.item(iid, values=values)
+        else:
+            self.job_tree.insert('', 'end', iid=iid, values=values)
+
+    def selected_job(self):
+        sel = self.job_tree.selection()
+        return int(sel[0]) if sel else None
+
+    def set_concurrency(self):
+        try:
+            self.jobs.set_concurrency(self.concurrency_var.get())
+        except tk.TclError:
+            pass
+
+    def cancel_job(self):
+        job_id = self.selected_job()
+        if job_id is not None and self.jobs.cancel(job_id):
+            self.log_msg(f'[{job_id}] Cancelling... Please wait')
+
+    def retry_job(self):
+        job_id = self.selected_job()
+        if job_id is not None and not self.jobs.retry(job_id):
+            self.log_msg(f'[{job_id}] Only failed or cancelled jobs can be retried')
+
+    def clear_finished_jobs(self):
+        self.jobs.remove_finished()
+        live = {str(job.id) for job in self.jobs.jobs()}
+        for iid in self.job_tree.get_children():
+            if iid not in live:
+                self.job_tree.delete(iid)
+
     def load_video(self):
         path = filedialog.askopenfilename(
             filetypes=[('Video Files', '*.mp4;*.avi;*.mov;*.mkv'), ('All Files', '*.*')]
         )
         if not path: 
             return
-            
-        self.video_path = path
-        self.cap = cv2.VideoCapture(path)
-        if not self.cap.isOpened():
+        self.open_video(path)
+
+    def open_video(self, path):
+        try:
+            frames = FrameServer(path)
+        except VideoError:
             messagebox.showerror("Error", "Could not open video file")
-            return
+            return False
             
-        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = self.cap.get(cv2.CAP_PROP_FPS)
-        duration = self.total_frames / fps
-        minutes = int(duration // 60)
-        seconds = int(duration % 60)
-        
-        self.frame_slider.config(from_=0, to=self.total_frames-1)
-        self.video_info.config(text=f"{path.split('/')[-1]}\n{self.total_frames} frames | {minutes}m {seconds}s | {fps:.1f} fps")
+        if self.frames:
+            self.frames.close()
+        self.video_path = path
+        self.frames = frames
+        self.preview_cache.clear()
+        # Container estimates until the index below replaces them
+        fps = frames.cap.get(cv2.CAP_PROP_FPS)
+        self.show_video_info(frames.frame_count, frames.frame_count / fps if fps else 0, fps)
         self.log_msg(f'Loaded video: {path}')
+        if self.project and self.project.source != path:
+            self.project = None
         self.seek_frame(0)
+        # An opened project for this video carries its index
+        project = self.project
+
+        def work():
+            cancel = lambda: self.video_path != path
+            try:
+                index = project.frame_index(cancel) if project else load_index(path, cancel)
+            except Exception as e:
+                self.ui_queue.put(('log', f'Indexing failed, seeking may be inexact: {e}'))
+                return
+            if index is not None:
+                self.ui_queue.put(('index', (path, index)))
+
+        threading.Thread(target=work, daemon=True).start()
+        return True
+
+    def show_video_info(self, total, duration, fps):
+        self.total_frames = total
+        minutes = int(duration // 60)
+        seconds = int(duration % 60)
+        self.frame_slider.config(from_=0, to=max(total - 1, 0))
+        self.video_info.config(text=f"{os.path.basename(self.video_path)}\n{total} frames | {minutes}m {seconds}s | {fps:.1f} fps")
+
+    def apply_index(self, path, index):
+        # Exact frame count, duration and keyframe seeking for the navigator
+        if path != self.video_path or not index.frame_count:
+            return
+        estimate = self.total_frames
+        self.frames.set_index(index)
+        self.show_video_info(index.frame_count, index.duration, index.fps)
+        if index.frame_count != estimate:
+            self.log_msg(f'Indexed {index.frame_count} frames (container reported {estimate})')
+        if self.current_idx >= index.frame_count:
+            self.seek_frame(index.frame_count - 1)
+        else:
+            self.frame_label.config(text=f'Frame: {self.current_idx+1}/{self.total_frames}')
+
+    def project_settings(self):
+        if self.smart_var.get():
+            renderer = 'smart'
+        elif self.resume_var.get():
+            renderer = 'resumable'
+        else:
+            renderer = 'standard'
+        return dict(self.engine_settings(), workers=self.workers_var.get(),
+                    backend=self.backend_var.get(), renderer=renderer,
+                    max_memory_mb=self.max_memory_var.get() or None)
+
+    def save_project(self):
+        if not self.frames:
+            messagebox.showerror('Error', 'Please load a video first')
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=PROJECT_EXT,
+            filetypes=[('Video Text Remover Project', '*' + PROJECT_EXT)]
+        )
+        if not path:
+            return
+        # Keeps the derived data of an opened project for the same video
+        project = self.project or Project(self.video_path)
+        project.masks = self.video_masks()
+        project.settings = self.project_settings()
+        try:
+            project.probe()
+            if self.frames.index is not None:
+                project.frame_index()  # already indexed, so this only copies it
+            project.plan_summary(self.total_frames)
+            project.save(path)
+        except (OSError, ProjectError, VideoError) as e:
+            messagebox.showerror('Error', f'Could not save project: {e}')
+            return
+        self.project = project
+        self.log_msg(f'Saved project: {path}')
+
+    def open_project(self):
+        path = filedialog.askopenfilename(
+            filetypes=[('Video Text Remover Project', '*' + PROJECT_EXT), ('All Files', '*.*')]
+        )
+        if not path:
+            return
+        try:
+            project = Project.load(path)
+            info = project.probe()
+        except (ProjectError, VideoError) as e:
+            messagebox.showerror('Error', str(e))
+            return
+        # Opening the video indexes it from the project when it can
+        self.project = project
+        if not self.open_video(project.source):
+            self.project = None
+            return
+
+        s = project.settings
+        for key, var in (('mode', self.inpaint_mode_var), ('algorithm', self.algorithm_var),
+                         ('radius', self.radius_var), ('cache_size', self.cache_size_var),
+                         ('pyramid_scale', self.pyramid_scale_var), ('workers', self.workers_var),
+                         ('backend', self.backend_var)):
+            if s.get(key) is not None:
+                var.set(s[key])
+        self.max_memory_var.set(int(s.get('max_memory_mb') or 0))
+        self.smart_var.set(s.get('renderer') == 'smart')
+        self.resume_var.set(s.get('renderer') == 'resumable')
+
+        canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        size = (info.width, info.height)
+        self.rectangles = [video_to_canvas(m.rect, canvas_size, size) for m in project.masks]
+        self.mask_times = [{'start': m.start, 'end': m.end,
+                            'keyframes': {f: video_to_canvas(r, canvas_size, size) for f, r in m.keyframes}}
+                           for m in project.masks]
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.selected_idx = None
+        self.update_keyframed_masks()
+        self.draw_rectangles()
+        summary = project.plan_summary(self.total_frames)
+        self.log_msg(f'Opened project: {len(project.masks)} masks, '
+                     f"{summary['masked_frames']} of {self.total_frames} frames masked")
 
     def on_slider(self, val):
         idx = int(float(val))
         self.seek_frame(idx)
 
     def seek_frame(self, idx):
-        if not self.cap: 
+        if not self.frames: 
             return
             
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = self.cap.read()
-        if not ret: 
+        frame = self.frames.get(idx)
+        if frame is None: 
             return
             
         self.frame = frame
+        self.current_idx = idx
+        self.update_keyframed_masks()
         self.display_frame(frame)
         self.frame_label.config(text=f'Frame: {idx+1}/{self.total_frames}')
         self.frame_slider.set(idx)
 
     def prev_frame(self):
-        if not self.cap: 
+        if not self.frames: 
             return
             
-        idx = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
-        if idx > 0:
-            self.seek_frame(idx-1)
+        if self.current_idx > 0:
+            self.seek_frame(self.current_idx-1)
 
     def next_frame(self):
-        if not self.cap: 
+        if not self.frames: 
             return
             
-        idx = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
-        if idx < self.total_frames-1:
-            self.seek_frame(idx+1)
+        if self.current_idx < self.total_frames-1:
+            self.seek_frame(self.current_idx+1)
 
     def display_frame(self, frame):
-        img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w = img.shape[:2]
-        
-        # Calculate scaling to fit canvas while maintaining aspect ratio
         canvas_width = self.canvas.winfo_width()
         canvas_height = self.canvas.winfo_height()
         
-        scale = min(canvas_width/w, canvas_height/h)
-        nw, nh = int(w*scale), int(h*scale)
-        
-        resized = cv2.resize(img, (nw, nh))
-        self.photo = ImageTk.PhotoImage(image=Image.fromarray(resized))
-        
-        self.canvas.delete('all')
-        self.canvas.create_image(canvas_width//2, canvas_height//2, image=self.photo, anchor='center')
+        # Reuse the scaled preview when this frame was shown at this size before
+        key = (self.current_idx, canvas_width, canvas_height)
+        photo = self.preview_cache.get(key)
+        if photo is None:
+            img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            h, w = img.shape[:2]
+            
+            # Calculate scaling to fit canvas while maintaining aspect ratio
+            scale = min(canvas_width/w, canvas_height/h)
+            nw, nh = int(w*scale), int(h*scale)
+            
+            resized = cv2.resize(img, (nw, nh))
+            photo = ImageTk.PhotoImage(image=Image.fromarray(resized))
+            self.preview_cache[key] = photo
+            if len(self.preview_cache) > self.PREVIEW_CACHE_SIZE:
+                self.preview_cache.popitem(last=False)
+        else:
+            self.preview_cache.move_to_end(key)
+        self.photo = photo
+        
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(0, 0, anchor='center')
+            self.canvas.tag_lower(self.image_item)
+        self.canvas.itemconfig(self.image_item, image=self.photo)
+        self.canvas.coords(self.image_item, canvas_width//2, canvas_height//2)
         self.draw_rectangles()
 
     def draw_rectangles(self):
-        self.canvas.delete('rect')
-        self.mask_list.delete(0, tk.END)
-        
+        # Full refresh after the mask set, selection or frame changed
+        self.update_overlay()
+        self.update_mask_list()
+
+    def update_overlay(self, only=None):
+        # Sync canvas items with self.rectangles, moving existing items with
+        # coords(). With `only` set, just that mask (and the handles) moves.
+        while len(self.rect_items) < len(self.rectangles):
+            self.rect_items.append(self.canvas.create_rectangle(
+                0, 0, 0, 0, width=2, dash=(5,1), tags='rect'))
+        while len(self.rect_items) > len(self.rectangles):
+            self.canvas.delete(self.rect_items.pop())
+        
+        indices = range(len(self.rectangles)) if only is None else [only]
+        for idx in indices:
+            item = self.rect_items[idx]
+            self.canvas.coords(item, *self.rectangles[idx])
+            if only is None:
+                # Greyed out on frames where the mask is inactive
+                if idx==self.selected_idx:
+                    col = self.ACCENT_COLOR
+                elif self.mask_active(idx, self.current_idx):
+                    col = 'red'
+                else:
+                    col = '#777777'
+                self.canvas.itemconfig(item, outline=col)
+        
+        # Draw handles if selected
+        if self.selected_idx is not None:
+            self.draw_handles(self.rectangles[self.selected_idx])
+        else:
+            for item in self.handle_items:
+                self.canvas.itemconfig(item, state='hidden')
+
+    def update_mask_list(self):
+        # Only rewrites listbox rows whose text changed
+        labels = []
         for idx, (x1,y1,x2,y2) in enumerate(self.rectangles):
-            # Draw rectangle
-            col = self.ACCENT_COLOR if idx==self.selected_idx else 'red'
-            self.canvas.create_rectangle(x1,y1,x2,y2, outline=col, width=2, dash=(5,1), tags='rect')
-            
-            # Add to listbox
-            self.mask_list.insert(tk.END, f"Mask {idx+1}: ({x1},{y1}) to ({x2},{y2})")
-            
-            # Draw handles if selected
-            if idx==self.selected_idx:
-                self.draw_handles((x1,y1,x2,y2))
+            times = self.mask_times[idx]
+            end = times['end'] if times['end'] is not None else self.total_frames
+            label = f"Mask {idx+1}: ({x1},{y1}) to ({x2},{y2}) | frames {times['start']+1}-{end}"
+            if times['keyframes']:
+                label += f" | {len(times['keyframes'])} keys"
+            labels.append(label)
+        
+        if labels != self.list_labels:
+            if len(labels) < len(self.list_labels):
+                self.mask_list.delete(len(labels), tk.END)
+            for idx, label in enumerate(labels):
+                if idx >= len(self.list_labels):
+                    self.mask_list.insert(tk.END, label)
+                elif label != self.list_labels[idx]:
+                    self.mask_list.delete(idx)
+                    self.mask_list.insert(idx, label)
+            self.list_labels = labels
         
         # Highlight selected item in listbox
+        self.mask_list.selection_clear(0, tk.END)
         if self.selected_idx is not None:
-            self.mask_list.selection_clear(0, tk.END)
             self.mask_list.selection_set(self.selected_idx)
             self.mask_list.see(self.selected_idx)
 
     def draw_handles(self, rect):
-        x1,y1,x2,y2 = rect
-        handles = [
-            (x1, y1),  # Top-left
-            ((x1+x2)//2, y1),  # Top-center
-            (x2, y1),  # Top-right
-            (x2, (y1+y2)//2),  # Middle-right
-            (x2, y2),  # Bottom-right
-            ((x1+x2)//2, y2),  # Bottom-center
-            (x1, y2),  # Bottom-left
-            (x1, (y1+y2)//2)  # Middle-left
-        ]
-        
-        for hx,hy in handles:
-            self.canvas.create_rectangle(
+        if not self.handle_items:
+            self.handle_items = [
+                self.canvas.create_rectangle(
+                    0, 0, 0, 0, fill='white', outline=self.ACCENT_COLOR, width=2, tags='rect'
+                ) for _ in range(8)
+            ]
+        
+        for item, (hx,hy) in zip(self.handle_items, self.get_handles(rect)):
+            self.canvas.coords(item,
                 hx-self.HANDLE_SIZE, hy-self.HANDLE_SIZE,
-                hx+self.HANDLE_SIZE, hy+self.HANDLE_SIZE,
-                fill='white', outline=self.ACCENT_COLOR, width=2, tags='rect'
-            )
+                hx+self.HANDLE_SIZE, hy+self.HANDLE_SIZE)
+            self.canvas.itemconfig(item, state='normal')
+            self.canvas.tag_raise(item)
 
     def on_mouse_down(self, event):
         x, y = event.x, event.y
@@ -423,6 +853,7 @@ class VideoTextRemover:
         self.drawing = True
         self.start_x, self.start_y = x, y
         self._snapshot()
+        self.update_overlay()
 
     def get_handles(self, rect):
         x1, y1, x2, y2 = rect
@@ -441,11 +872,12 @@ class VideoTextRemover:
         x, y = event.x, event.y
         
         if self.drawing:
-            self.display_frame(self.frame)
-            self.canvas.create_rectangle(
-                self.start_x, self.start_y, x, y, 
-                outline=self.ACCENT_COLOR, width=2, dash=(5,1), tags='rect'
-            )
+            if self.draft_item is None:
+                self.draft_item = self.canvas.create_rectangle(
+                    self.start_x, self.start_y, x, y, 
+                    outline=self.ACCENT_COLOR, width=2, dash=(5,1), tags='rect'
+                )
+            self.canvas.coords(self.draft_item, self.start_x, self.start_y, x, y)
         elif self.resizing:
             x1, y1, x2, y2 = self.rectangles[self.selected_idx]
             coords = [x1, y1, x2, y2]
@@ -469,23 +901,35 @@ class VideoTextRemover:
                 coords[0] = x
                 
             self.rectangles[self.selected_idx] = tuple(coords)
-            self.draw_rectangles()
+            self.update_overlay(only=self.selected_idx)
         elif self.dragging:
             dx, dy = x - self.start_x, y - self.start_y
             x1, y1, x2, y2 = self.orig_rect
             self.rectangles[self.selected_idx] = (x1+dx, y1+dy, x2+dx, y2+dy)
-            self.draw_rectangles()
+            self.update_overlay(only=self.selected_idx)
 
     def on_mouse_up(self, event):
         if self.drawing:
             x, y = event.x, event.y
             # Only add if it's a meaningful rectangle (not just a click)
             if abs(x - self.start_x) > 10 and abs(y - self.start_y) > 10:
-                self.rectangles.append((self.start_x, self.start_y, x, y))
+                self.rectangles.append(normalize_rect((self.start_x, self.start_y, x, y)))
+                self.mask_times.append({'start': 0, 'end': None, 'keyframes': {}})
                 self.selected_idx = len(self.rectangles) - 1
+            if self.draft_item is not None:
+                self.canvas.delete(self.draft_item)
+                self.draft_item = None
             self.drawing = False
             self.draw_rectangles()
         else:
+            # Resizing past the opposite edge inverts the rectangle
+            if self.resizing:
+                self.rectangles[self.selected_idx] = normalize_rect(self.rectangles[self.selected_idx])
+            # Moving a keyframed mask updates its key on this frame
+            if (self.resizing or self.dragging) and self.mask_times[self.selected_idx]['keyframes']:
+                self.mask_times[self.selected_idx]['keyframes'][self.current_idx] = self.rectangles[self.selected_idx]
+            if self.resizing or self.dragging:
+                self.draw_rectangles()
             self.resizing = self.dragging = False
 
     def on_mask_select(self, event):
@@ -494,16 +938,19 @@ class VideoTextRemover:
             self.selected_idx = selection[0]
             self.draw_rectangles()
 
+    def _copy_times(self):
+        return [dict(t, keyframes=dict(t['keyframes'])) for t in self.mask_times]
+
     def _snapshot(self):
-        self.undo_stack.append(list(self.rectangles))
+        self.undo_stack.append((list(self.rectangles), self._copy_times()))
         self.redo_stack.clear()
 
     def undo(self, event=None):
         if not self.undo_stack: 
             return
             
-        self.redo_stack.append(list(self.rectangles))
-        self.rectangles = self.undo_stack.pop()
+        self.redo_stack.append((list(self.rectangles), self._copy_times()))
+        self.rectangles, self.mask_times = self.undo_stack.pop()
         self.selected_idx = None
         self.draw_rectangles()
 
@@ -511,8 +958,8 @@ class VideoTextRemover:
         if not self.redo_stack: 
             return
             
-        self.undo_stack.append(list(self.rectangles))
-        self.rectangles = self.redo_stack.pop()
+        self.undo_stack.append((list(self.rectangles), self._copy_times()))
+        self.rectangles, self.mask_times = self.redo_stack.pop()
         self.selected_idx = None
         self.draw_rectangles()
 
@@ -520,6 +967,7 @@ class VideoTextRemover:
         if self.selected_idx is not None:
             self._snapshot()
             self.rectangles.pop(self.selected_idx)
+            self.mask_times.pop(self.selected_idx)
             self.selected_idx = None
             self.draw_rectangles()
 
@@ -527,11 +975,58 @@ class VideoTextRemover:
         if self.rectangles:
             self._snapshot()
             self.rectangles = []
+            self.mask_times = []
             self.selected_idx = None
             self.draw_rectangles()
 
+    def mask_active(self, idx, frame):
+        times = self.mask_times[idx]
+        return times['start'] <= frame and (times['end'] is None or frame < times['end'])
+
+    def update_keyframed_masks(self):
+        # Keyframed masks follow their interpolated position on the current frame
+        for idx, times in enumerate(self.mask_times):
+            if times['keyframes']:
+                mask = Mask(self.rectangles[idx], keyframes=times['keyframes'].items())
+                self.rectangles[idx] = mask.rect_at(self.current_idx)
+
+    def set_mask_start(self):
+        if self.selected_idx is None:
+            return
+        self._snapshot()
+        times = self.mask_times[self.selected_idx]
+        times['start'] = self.current_idx
+        if times['end'] is not None and times['end'] <= self.current_idx:
+            times['end'] = None
+        self.draw_rectangles()
+
+    def set_mask_end(self):
+        if self.selected_idx is None:
+            return
+        self._snapshot()
+        times = self.mask_times[self.selected_idx]
+        # The range includes the current frame
+        times['end'] = self.current_idx + 1
+        if times['start'] > self.current_idx:
+            times['start'] = 0
+        self.draw_rectangles()
+
+    def add_keyframe(self):
+        if self.selected_idx is None:
+            return
+        self._snapshot()
+        self.mask_times[self.selected_idx]['keyframes'][self.current_idx] = self.rectangles[self.selected_idx]
+        self.draw_rectangles()
+
+    def reset_mask_range(self):
+        if self.selected_idx is None:
+            return
+        self._snapshot()
+        self.mask_times[self.selected_idx] = {'start': 0, 'end': None, 'keyframes': {}}
+        self.draw_rectangles()
+
     def remove_text(self):
-        if not self.cap:
+        if not self.frames:
             messagebox.showerror('Error', 'Please load a video first')
             return
             
@@ -547,68 +1042,172 @@ class VideoTextRemover:
             return
             
         self.log_msg('Starting inpainting process...')
-        threading.Thread(
-            target=self._remove_worker,
-            args=(out,),
-            daemon=True
-        ).start()
-
-    def _remove_worker(self, out_path):
-        cap = cv2.VideoCapture(self.video_path)
-        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        # Get canvas dimensions for coordinate conversion
-        canvas_w = self.canvas.winfo_width()
-        canvas_h = self.canvas.winfo_height()
-        
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(out_path, fourcc, fps, (w, h))
-        
-        for i in range(total):
-            if self.cancel_requested: 
-                break
-                
-            ret, frame = cap.read()
-            if not ret: 
-                break
-                
-            # Create mask
-            mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-            
-            for x1, y1, x2, y2 in self.rectangles:
-                # Convert canvas coordinates to video coordinates
-                xx1 = int(x1 * w / canvas_w)
-                xx2 = int(x2 * w / canvas_w)
-                yy1 = int(y1 * h / canvas_h)
-                yy2 = int(y2 * h / canvas_h)
-                
-                mask[yy1:yy2, xx1:xx2] = 255
-                
-            # Inpaint the masked areas
-            res = cv2.inpaint(frame, mask, 3, cv2.INPAINT_TELEA)
-            out.write(res)
-            
-            # Update progress
-            pct = (i+1)/total*100
-            self.progress_var.set(pct)
-            self.progress_label.config(text=f'{int(pct)}%')
-            self.root.update()
-            
-        cap.release()
-        out.release()
-        
-        if self.cancel_requested:
-            self.log_msg('Processing cancelled by user')
+        self.submit_job(self.video_path, out)
+
+    def queue_videos(self):
+        # Queue a batch that shares the current masks, e.g. every episode of a show
+        if not self.frames or not self.rectangles:
+            messagebox.showerror('Error', 'Load a video and select text regions to use for the batch')
+            return
+        paths = filedialog.askopenfilenames(
+            filetypes=[('Video Files', '*.mp4;*.avi;*.mov;*.mkv'), ('All Files', '*.*')]
+        )
+        if not paths:
+            return
+        folder = filedialog.askdirectory(title='Output folder')
+        if not folder:
+            return
+        for path in paths:
+            stem, ext = os.path.splitext(os.path.basename(path))
+            self.submit_job(path, os.path.join(folder, f'{stem}_clean{ext}'))
+        self.log_msg(f'Queued {len(paths)} videos')
+
+    def video_masks(self):
+        # Masks are drawn on the scaled preview; the processing core wants video pixels
+        h, w = self.frame.shape[:2]
+        canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        masks = []
+        for rect, times in zip(self.rectangles, self.mask_times):
+            keyframes = [(f, canvas_to_video(r, canvas_size, (w, h)))
+                         for f, r in times['keyframes'].items()]
+            masks.append(Mask(canvas_to_video(rect, canvas_size, (w, h)),
+                              times['start'], times['end'], keyframes))
+        return masks
+
+    def submit_job(self, src, dst):
+        # The spec copies masks and settings, so editing them later only
+        # affects jobs queued afterwards
+        if self.smart_var.get():
+            renderer = 'smart'
+        elif self.resume_var.get():
+            renderer = 'resumable'
         else:
-            self.log_msg(f'Processing complete. Saved to: {out_path}')
-            messagebox.showinfo('Success', 'Video processing completed successfully')
+            renderer = 'standard'
+        telemetry = None
+        if self.telemetry_var.get() or self.profile_var.get():
+            telemetry = Telemetry(dst + '.trace.jsonl' if self.telemetry_var.get() else None,
+                                  dst + '.prof' if self.profile_var.get() else None)
+        spec = JobSpec(src, dst, self.video_masks(), renderer=renderer,
+                       workers=self.workers_var.get(),
+                       max_memory_mb=self.max_memory_var.get() or None,
+                       backend=self.backend_var.get(),
+                       progress_interval=self.UI_PROGRESS_INTERVAL, telemetry=telemetry,
+                       **self.engine_settings())
+        return self.jobs.submit(spec)
+
+    def engine_settings(self):
+        return dict(mode=self.inpaint_mode_var.get(),
+                    algorithm=self.algorithm_var.get(),
+                    radius=self.radius_var.get(),
+                    cache_size=self.cache_size_var.get(),
+                    pyramid_scale=self.pyramid_scale_var.get())
+
+    def check_quality(self):
+        # Scores the selected mode against full-resolution ROI inpainting on
+        # frames sampled from the loaded video
+        if not self.frames or not self.rectangles:
+            messagebox.showerror('Error', 'Load a video and select text regions first')
+            return
+        mode = self.inpaint_mode_var.get()
+        src, masks = self.video_path, self.video_masks()
+        options = self.engine_settings()
+        self.log_msg(f'Checking {mode} quality on sampled frames...')
+
+        def work():
+            try:
+                resolved, _ = resolve_algorithm(src, masks, options)
+                r = check_quality(src, masks, reference={'mode': 'roi', 'radius': options['radius']},
+                                  **resolved)
+            except Exception as e:
+                self.ui_queue.put(('log', f'Quality check failed: {e}'))
+                return
+            self.ui_queue.put(('log', f"{mode}/{resolved['algorithm']}: PSNR {r['psnr']} dB, SSIM {r['ssim']}, "
+                                      f"{r['candidate_ms']} ms vs {r['reference_ms']} ms per frame "
+                                      f"({r['speedup']}x) over {r['frames']} frames"))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def detect_masks(self):
+        if not self.frames:
+            messagebox.showerror('Error', 'Please load a video first')
+            return
+        path, method = self.video_path, self.detect_method_var.get()
+        key = {'method': method, 'model': None, 'sample_seconds': SAMPLE_SECONDS}
+        cached = self.project.cached('detections', key) if self.project else None
+        if cached is not None:
+            self.add_detected_masks(path, [Mask.from_dict(d) for d in cached])
+            return
+        self.log_msg(f'Detecting text ({method}) on sampled frames...')
+
+        def work():
+            try:
+                masks = detect_text(path, method)
+            except Exception as e:
+                self.ui_queue.put(('log', f'Text detection failed: {e}'))
+                return
+            self.ui_queue.put(('detected', (path, masks, key)))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def add_detected_masks(self, path, masks, key=None):
+        # Detected masks join the hand-drawn ones and are edited the same way
+        if path != self.video_path:
+            return
+        if key is not None and self.project:
+            self.project.store('detections', key, [m.to_dict() for m in masks])
+        if not masks:
+            self.log_msg('No text regions found')
+            return
+        self._snapshot()
+        h, w = self.frame.shape[:2]
+        canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        for m in masks:
+            self.rectangles.append(video_to_canvas(m.rect, canvas_size, (w, h)))
+            self.mask_times.append({'start': m.start, 'end': m.end, 'keyframes': {}})
+        self.draw_rectangles()
+        self.log_msg(f'Added {len(masks)} detected text regions')
+
+    def track_selected_mask(self):
+        if self.selected_idx is None:
+            messagebox.showerror('Error', 'Select a mask drawn around the text to track')
+            return
+        idx, frame = self.selected_idx, self.current_idx
+        h, w = self.frame.shape[:2]
+        canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        rect = canvas_to_video(self.rectangles[idx], canvas_size, (w, h))
+        path, method = self.video_path, self.track_method_var.get()
+        self.log_msg(f'Tracking mask {idx + 1} ({method}) from frame {frame}...')
+
+        def work():
+            try:
+                mask = track_mask(path, rect, frame, method=method)
+            except Exception as e:
+                self.ui_queue.put(('log', f'Tracking failed: {e}'))
+                return
+            self.ui_queue.put(('tracked', (path, idx, mask)))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def apply_tracked_mask(self, path, idx, mask):
+        # The tracked path replaces the mask's range and keyframes
+        if path != self.video_path or idx >= len(self.rectangles):
+            return
+        self._snapshot()
+        h, w = self.frame.shape[:2]
+        canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        self.mask_times[idx] = {
+            'start': mask.start, 'end': mask.end,
+            'keyframes': {f: video_to_canvas(r, canvas_size, (w, h)) for f, r in mask.keyframes},
+        }
+        self.update_keyframed_masks()
+        self.draw_rectangles()
+        self.log_msg(f'Mask {idx + 1} tracked over frames {mask.start}-{mask.end - 1} '
+                     f'({len(mask.keyframes)} keyframes)')
 
     def cancel_processing(self):
-        self.cancel_requested = True
-        self.log_msg('Cancelling... Please wait')
+        if self.jobs.active:
+            self.jobs.cancel_all()
+            self.log_msg('Cancelling... Please wait')
 
 if __name__ == '__main__':
     root = tk.Tk()
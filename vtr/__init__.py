@@ -0,0 +1,22 @@
+from .algorithms import ALGORITHMS, DEFAULT_ALGORITHM, get_algorithm, register_algorithm
+from .autotune import AUTO, choose_algorithm, resolve_algorithm
+from .cache import DEFAULT_CACHE_SIZE, InpaintCache
+from .detect import DETECTORS, SAMPLE_SECONDS, TextDetector, detect_text
+from .engine import INPAINT_RADIUS, InpaintEngine
+from .frames import FrameServer
+from .index import FrameIndex, build_index, load_index
+from .jobs import Job, JobManager, JobSpec
+from .pipeline import FramePipeline
+from .plan import MaskPlan, canvas_to_video, normalize_rect, video_to_canvas
+from .processing import (ProcessResult, VideoError, VideoInfo, make_engine, open_video,
+                         process_video)
+from .progress import ProgressTracker, format_progress, format_stages, logging_listener
+from .project import PROJECT_EXT, Project, ProjectError
+from .pyramid import DEFAULT_SCALE as PYRAMID_SCALE, PyramidInpaint
+from .quality import check_quality, compare_engines, psnr, ssim
+from .resume import process_video_resumable
+from .segments import process_video_segmented, split_ranges
+from .smart import smart_render
+from .telemetry import Telemetry, format_summary
+from .timeline import Mask, MaskTimeline, TimelinePlan
+from .track import TRACKERS, TemplateTracker, track_mask, track_masks
@@ -0,0 +1,90 @@
+from functools import partial
+
+import cv2
+import numpy as np
+
+DEFAULT_ALGORITHM = 'telea'
+
+# Spatial inpainting algorithms by name. Each is called as
+# fn(src, mask, radius, dst=None) with an 8-bit BGR src and a mask that is
+# non-zero where pixels must be filled; it returns dst (allocated when None)
+# with unmasked pixels unchanged. Module-level functions, so engines using
+# them can be pickled for the process backend.
+ALGORITHMS = {}
+# Names the 'auto' choice benchmarks by default
+AUTO_CANDIDATES = []
+
+
+def register_algorithm(name, fn, auto=True):
+    # auto=False keeps an algorithm out of the default 'auto' benchmark,
+    # for ones that are far too slow on large holes to be worth timing
+    ALGORITHMS[name] = fn
+    if auto and name not in AUTO_CANDIDATES:
+        AUTO_CANDIDATES.append(name)
+
+
+def get_algorithm(name):
+    try:
+        return ALGORITHMS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inpaint algorithm: {name} (available: {', '.join(ALGORITHMS)})")
+
+
+def _opencv(flag, src, mask, radius, dst=None):
+    return cv2.inpaint(src, mask, radius, flag, dst=dst)
+
+
+def _xphoto(flag, src, mask, radius, dst=None):
+    # xphoto wants the opposite mask (non-zero = known); shift-map works in Lab
+    lab = flag == cv2.xphoto.INPAINT_SHIFTMAP
+    img = cv2.cvtColor(src, cv2.COLOR_BGR2Lab) if lab else src
+    out = np.empty_like(img)
+    cv2.xphoto.inpaint(img, cv2.bitwise_not(mask), out, flag)
+    if lab:
+        out = cv2.cvtColor(out, cv2.COLOR_Lab2BGR)
+    if dst is None:
+        dst = src.copy()
+    else:
+        dst[...] = src
+    cv2.copyTo(out, mask, dst)
+    return dst
+
+
+def blur_fill(src, mask, radius, dst=None):
+    # Push-pull fill: average the known pixels down a Gaussian pyramid until
+    # the hole is covered, then blend coarse colours back up into it. Smooth
+    # and much cheaper than TELEA on big holes; fine for low-importance areas.
+    weight = (mask == 0).astype(np.float32)
+    image = src.astype(np.float32) * weight[..., None]
+    levels = [(image, weight)]
+    while weight.min() == 0 and min(weight.shape) > 2:
+        image, weight = cv2.pyrDown(image), cv2.pyrDown(weight)
+        if image.ndim == 2:
+            image = image[..., None]
+        levels.append((image, weight))
+    image, weight = levels[-1]
+    fill = image / np.maximum(weight, 1e-6)[..., None]
+    for image, weight in reversed(levels[:-1]):
+        up = cv2.pyrUp(fill, dstsize=weight.shape[::-1])
+        if up.ndim == 2:
+            up = up[..., None]
+        w = np.minimum(weight, 1.0)[..., None]
+        fill = image + up * (1 - w)
+    if dst is None:
+        dst = src.copy()
+    else:
+        dst[...] = src
+    cv2.copyTo(np.clip(fill, 0, 255).astype(np.uint8), mask, dst)
+    return dst
+
+
+register_algorithm('telea', partial(_opencv, cv2.INPAINT_TELEA))
+register_algorithm('ns', partial(_opencv, cv2.INPAINT_NS))
+register_algorithm('blur', blur_fill)
+# opencv-contrib's xphoto module, when installed. These take seconds to
+# minutes per caption-sized hole, so they are only used when chosen by name.
+if hasattr(cv2, 'xphoto') and hasattr(cv2.xphoto, 'inpaint'):
+    for _name, _flag in (('xphoto-fsr-fast', 'INPAINT_FSR_FAST'),
+                         ('xphoto-fsr-best', 'INPAINT_FSR_BEST'),
+                         ('xphoto-shiftmap', 'INPAINT_SHIFTMAP')):
+        register_algorithm(_name, partial(_xphoto, getattr(cv2.xphoto, _flag)), auto=False)
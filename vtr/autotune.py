@@ -0,0 +1,85 @@
+import time
+
+import numpy as np
+
+from .algorithms import AUTO_CANDIDATES, DEFAULT_ALGORITHM
+from .processing import ENGINE_OPTIONS, make_engine
+from .quality import roi_scores, sample_frames
+
+AUTO = 'auto'
+DEFAULT_MIN_PSNR = 30.0
+DEFAULT_AUTO_SAMPLES = 4
+
+
+def _time_engine(options, timeline, frame_size, frames, budget=None):
+    # Outputs and seconds for inpainting the frames, or None once the time
+    # passes budget
+    engine = make_engine(**options)
+    plans = engine.compile_timeline(timeline, frame_size)
+    outputs, elapsed = [], 0.0
+    for idx, frame in frames:
+        started = time.perf_counter()
+        outputs.append(engine.apply(frame.copy(), plans.plan_for(idx)))
+        elapsed += time.perf_counter() - started
+        if budget is not None and elapsed > budget:
+            return None, elapsed
+    return outputs, elapsed
+
+
+def choose_algorithm(src, masks, min_psnr=DEFAULT_MIN_PSNR, samples=DEFAULT_AUTO_SAMPLES,
+                     candidates=None, **engine_options):
+    # Microbenchmarks each algorithm on frames sampled from the job and returns
+    # (name, report) for the fastest whose ROIs stay within min_psnr dB of
+    # TELEA. A candidate is dropped as soon as it is slower than the best so
+    # far. Temporal jobs are scored in 'roi' mode, since the algorithm only
+    # fills pixels the background model has never seen. Options other than
+    # make_engine()'s are ignored, so a job's full options can be passed.
+    # With no masked pixels in the samples it returns the default and an
+    # empty report.
+    timeline, info, frames = sample_frames(src, masks, samples)
+    options = {k: v for k, v in engine_options.items() if k in ENGINE_OPTIONS and k != 'algorithm'}
+    options['cache_size'] = 0
+    if options.get('mode') == 'temporal':
+        options['mode'] = 'roi'
+    names = [DEFAULT_ALGORITHM] + [n for n in (candidates or AUTO_CANDIDATES) if n != DEFAULT_ALGORITHM]
+
+    # Frames whose masks all lie outside the picture have nothing to score
+    plans = make_engine(**options).compile_timeline(timeline, info.size)
+    frames = [(idx, frame) for idx, frame in frames if plans.plan_for(idx) is not None]
+    if not frames:
+        return DEFAULT_ALGORITHM, []
+    rois = [plans.plan_for(idx).rois for idx, _ in frames]
+    reference, best_secs = _time_engine(dict(options, algorithm=DEFAULT_ALGORITHM),
+                                        timeline, info.size, frames)
+    best = DEFAULT_ALGORITHM
+    n = len(frames) or 1
+    report = [{'algorithm': best, 'ms': round(best_secs / n * 1000, 2), 'psnr': None}]
+    for name in names[1:]:
+        outputs, secs = _time_engine(dict(options, algorithm=name), timeline, info.size,
+                                     frames, budget=best_secs)
+        entry = {'algorithm': name, 'ms': round(secs / n * 1000, 2), 'psnr': None}
+        report.append(entry)
+        if outputs is None:
+            entry['skipped'] = 'slower'
+            continue
+        # Masked pixels only, like check_quality
+        scores = [p for frame_rois, a, b in zip(rois, reference, outputs)
+                  for p, _ in roi_scores(a, b, frame_rois)]
+        entry['psnr'] = round(float(np.mean(scores)), 2)
+        if entry['psnr'] >= min_psnr and secs < best_secs:
+            best, best_secs = name, secs
+    for entry in report:
+        entry['chosen'] = entry['algorithm'] == best
+    return best, report
+
+
+def resolve_algorithm(src, masks, engine_options):
+    # Returns (engine_options, report): with algorithm='auto' the options get
+    # the chosen algorithm and report is choose_algorithm()'s; otherwise they
+    # are returned as-is with report None. 'auto_min_psnr' sets the threshold.
+    options = dict(engine_options)
+    min_psnr = options.pop('auto_min_psnr', DEFAULT_MIN_PSNR)
+    if options.get('algorithm') != AUTO:
+        return options, None
+    options['algorithm'], report = choose_algorithm(src, masks, min_psnr, **options)
+    return options, report
@@ -0,0 +1,241 @@
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from .algorithms import ALGORITHMS, DEFAULT_ALGORITHM
+from .engine import InpaintEngine
+from .memory import peak_rss_mb
+from .pipeline import FramePipeline
+from .processing import open_video, process_video
+from .quality import psnr, ssim
+
+DEFAULT_FRAMES = 60
+DEFAULT_THRESHOLD = 0.10   # allowed fractional fps drop against the baseline
+DEFAULT_PSNR_DROP = 1.0    # allowed PSNR drop in dB against the baseline
+QUALITY_STRIDE = 10        # score every Nth frame against the clean source
+
+# A small matrix for routine runs; --full runs the cross product below
+QUICK_SCENARIOS = [
+    dict(width=640, height=360, codec='MJPG', masks=1, coverage=0.05, motion='static'),
+    dict(width=640, height=360, codec='MJPG', masks=4, coverage=0.20, motion='moving'),
+    dict(width=1280, height=720, codec='mp4v', masks=1, coverage=0.05, motion='static'),
+    dict(width=1280, height=720, codec='mp4v', masks=2, coverage=0.10, motion='moving'),
+    dict(width=1920, height=1080, codec='mp4v', masks=1, coverage=0.10, motion='static'),
+]
+FULL_MATRIX = dict(size=[(640, 360), (1280, 720), (1920, 1080), (3840, 2160)],
+                   codec=['MJPG', 'mp4v'], masks=[1, 4], coverage=[0.05, 0.20],
+                   motion=['static', 'moving'])
+
+
+def scenario_name(s):
+    return (f"{s['width']}x{s['height']}-{s['codec']}-{s['masks']}m-"
+            f"{int(s['coverage'] * 100)}pct-{s['motion']}")
+
+
+def full_scenarios():
+    for (w, h), codec, masks, coverage, motion in itertools.product(*FULL_MATRIX.values()):
+        yield dict(width=w, height=h, codec=codec, masks=masks, coverage=coverage, motion=motion)
+
+
+def scenario_masks(s):
+    # `masks` caption bars spread down the frame, together covering
+    # `coverage` of the frame area
+    w, h = s['width'], s['height']
+    bar_h = max(2, int(h * s['coverage'] / s['masks']))
+    gap = (h - bar_h * s['masks']) // (s['masks'] + 1)
+    return [(0, gap + i * (bar_h + gap), w, gap + i * (bar_h + gap) + bar_h)
+            for i in range(s['masks'])]
+
+
+class SyntheticVideo:
+    # Deterministic frames: a blurred noise background, static or panning,
+    # with changing white captions drawn inside each mask rectangle. The
+    # clean background is the ground truth for output quality.
+    def __init__(self, scenario, seed=1):
+        self.scenario = scenario
+        w, h = scenario['width'], scenario['height']
+        rng = np.random.default_rng(seed)
+        noise = rng.integers(0, 255, (h, w * 2, 3), dtype=np.uint8)
+        self.background = cv2.GaussianBlur(noise, (0, 0), max(2, w // 160))
+        self.rects = scenario_masks(scenario)
+
+    def clean(self, i):
+        w = self.scenario['width']
+        x = (i * 3) % w if self.scenario['motion'] == 'moving' else 0
+        return self.background[:, x:x + w]
+
+    def frame(self, i):
+        frame = self.clean(i).copy()
+        for n, (x1, y1, x2, y2) in enumerate(self.rects):
+            scale = (y2 - y1) / 40
+            cv2.putText(frame, f'CAPTION {n} FRAME {i // 12}', (x1 + 8, y2 - (y2 - y1) // 4),
+                        cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), max(1, int(scale * 2)))
+        return frame
+
+    def write(self, path, frames, fps=25):
+        s = self.scenario
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*s['codec']), fps,
+                              (s['width'], s['height']))
+        if not out.isOpened():
+            raise RuntimeError(f"Codec {s['codec']} is not available for writing")
+        for i in range(frames):
+            out.write(self.frame(i))
+        out.release()
+
+
+def score_output(video, path, frames):
+    # Mean PSNR/SSIM of the masked areas against the clean background
+    cap, _ = open_video(path)
+    psnrs, ssims = [], []
+    try:
+        for i in range(frames):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if i % QUALITY_STRIDE:
+                continue
+            clean = video.clean(i)
+            for x1, y1, x2, y2 in video.rects:
+                psnrs.append(min(psnr(frame[y1:y2, x1:x2], clean[y1:y2, x1:x2]), 100.0))
+                ssims.append(ssim(frame[y1:y2, x1:x2], clean[y1:y2, x1:x2]))
+    finally:
+        cap.release()
+    return round(float(np.mean(psnrs)), 2), round(float(np.mean(ssims)), 4)
+
+
+def run_scenario(scenario, workdir, frames=DEFAULT_FRAMES, workers=None, backend='thread',
+                 **engine_options):
+    # Runs in a fresh process (see run_all) so peak RSS is per scenario
+    name = scenario_name(scenario)
+    video = SyntheticVideo(scenario)
+    ext = '.avi' if scenario['codec'] == 'MJPG' else '.mp4'
+    src = os.path.join(workdir, f'{name}-{frames}f{ext}')
+    if not os.path.exists(src):
+        video.write(src, frames)
+    dst = os.path.join(workdir, name + '-out' + ext)
+    startup_rss = peak_rss_mb()
+    started = time.perf_counter()
+    result = process_video(src, dst, video.rects, codec=scenario['codec'], workers=workers,
+                           backend=backend, **engine_options)
+    seconds = time.perf_counter() - started
+    quality_psnr, quality_ssim = score_output(video, dst, result.frames)
+    done = result.frames or 1
+    return dict(scenario, name=name, frames=result.frames,
+                seconds=round(seconds, 3),
+                fps=round(result.frames / seconds, 2) if seconds else None,
+                stage_ms={k: round(v / done * 1000, 3) for k, v in result.timing['stages'].items()},
+                peak_rss_mb=peak_rss_mb(), startup_rss_mb=startup_rss,
+                psnr=quality_psnr, ssim=quality_ssim, **result.stats)
+
+
+def run_all(scenarios, workdir, **options):
+    # One spawned process per scenario keeps RSS peaks and caches separate
+    ctx = mp.get_context('spawn')
+    for scenario in scenarios:
+        with ctx.Pool(1) as pool:
+            yield pool.apply(run_scenario, (scenario, workdir), options)
+
+
+def environment():
+    return {'python': platform.python_version(), 'opencv': cv2.__version__,
+            'numpy': np.__version__, 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, psnr_drop=DEFAULT_PSNR_DROP):
+    # Regressions against a previous run's results, matched by scenario name
+    old = {r['name']: r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        b = old.get(r['name'])
+        if not b:
+            continue
+        if b.get('fps') and r['fps'] < b['fps'] * (1 - threshold):
+            regressions.append(dict(name=r['name'], metric='fps', baseline=b['fps'], value=r['fps']))
+        if b.get('psnr') is not None and r['psnr'] < b['psnr'] - psnr_drop:
+            regressions.append(dict(name=r['name'], metric='psnr', baseline=b['psnr'], value=r['psnr']))
+    return regressions
+
+
+def emit(event, **fields):
+    sys.stdout.write(json.dumps(dict(event=event, **fields)) + '\n')
+    sys.stdout.flush()
+
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog='python -m vtr.bench',
+        description='Benchmark the processing core on synthetic videos. Results are printed as '
+                    'JSON lines and optionally saved and compared against a baseline.')
+    p.add_argument('--full', action='store_true', help='run the full scenario matrix')
+    p.add_argument('--only', help='comma separated substrings; run matching scenarios only')
+    p.add_argument('--frames', type=int, default=DEFAULT_FRAMES)
+    p.add_argument('--workdir', help='where test videos are generated and kept (default: temp dir)')
+    p.add_argument('-o', '--output', help='write all results to this JSON file')
+    p.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    p.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                   help=f'fail when fps drops by more than this fraction (default: {DEFAULT_THRESHOLD})')
+    p.add_argument('--psnr-drop', type=float, default=DEFAULT_PSNR_DROP,
+                   help=f'fail when PSNR drops by more than this many dB (default: {DEFAULT_PSNR_DROP})')
+    p.add_argument('--mode', choices=InpaintEngine.MODES, default='roi')
+    p.add_argument('--algorithm', choices=list(ALGORITHMS), default=DEFAULT_ALGORITHM)
+    p.add_argument('-j', '--workers', type=int)
+    p.add_argument('--backend', choices=FramePipeline.BACKENDS, default='thread')
+    p.add_argument('--max-memory', type=float, metavar='MB',
+                   help='frame memory limit passed to the pipeline')
+    p.add_argument('--cache-size', type=int, default=0,
+                   help='inpaint cache size; off by default so every frame is inpainted')
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scenarios = list(full_scenarios()) if args.full else QUICK_SCENARIOS
+    if args.only:
+        keys = args.only.split(',')
+        scenarios = [s for s in scenarios if any(k in scenario_name(s) for k in keys)]
+    workdir = args.workdir or tempfile.mkdtemp(prefix='vtr-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    options = dict(frames=args.frames, workers=args.workers, backend=args.backend,
+                   mode=args.mode, algorithm=args.algorithm, cache_size=args.cache_size,
+                   max_memory_mb=args.max_memory)
+
+    results = []
+    try:
+        for result in run_all(scenarios, workdir, **options):
+            results.append(result)
+            emit('scenario', **result)
+    finally:
+        # Generated videos are only kept in a --workdir
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report = {'environment': environment(),
+              'options': options,
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.psnr_drop)
+        for r in regressions:
+            emit('regression', **r)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+
+DEFAULT_CACHE_SIZE = 64
+
+
+class InpaintCache:
+    # LRU of inpainted ROI patches keyed by the ROI's mask and pixel content.
+    # tolerance=0 matches exact content by hash; above 0, a crop whose mean
+    # absolute difference from a recent crop of the same ROI is within
+    # tolerance reuses that crop's patch.
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, tolerance=0.0):
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Process workers get an empty cache of their own
+        state = self.__dict__.copy()
+        state['_entries'] = OrderedDict()
+        state['hits'] = state['misses'] = 0
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def lookup(self, roi_key, crop):
+        # Returns (patch or None, token for store())
+        if not self.tolerance:
+            key = (roi_key, hashlib.blake2b(crop.copy(order='C'), digest_size=16).digest())
+            with self._lock:
+                patch = self._entries.get(key)
+                if patch is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return patch[1], key
+                self.misses += 1
+            return None, key
+
+        limit = self.tolerance * crop.size
+        with self._lock:
+            for key in reversed(self._entries):
+                if key[0] != roi_key:
+                    continue
+                ref, patch = self._entries[key]
+                if cv2.norm(crop, ref, cv2.NORM_L1) <= limit:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return patch, key
+            self.misses += 1
+            return None, (roi_key, self.misses)
+
+    def store(self, key, crop, patch):
+        entry = (crop.copy() if self.tolerance else None, patch.copy())
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f'Inpaint cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)'
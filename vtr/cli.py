@@ -0,0 +1,425 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from .algorithms import ALGORITHMS, DEFAULT_ALGORITHM
+from .autotune import AUTO, DEFAULT_MIN_PSNR, resolve_algorithm
+from .cache import DEFAULT_CACHE_SIZE
+from .detect import DETECTORS, SAMPLE_SECONDS, detect_text
+from .engine import INPAINT_RADIUS, InpaintEngine
+from .pipeline import FramePipeline
+from .processing import DEFAULT_CODEC, open_video, process_video
+from .progress import logging_listener
+from .project import Project, ProjectError
+from .pyramid import DEFAULT_SCALE
+from .quality import DEFAULT_SAMPLES, check_quality
+from .resume import DEFAULT_SEGMENT_FRAMES, process_video_resumable
+from .segments import process_video_segmented
+from .smart import smart_render
+from .telemetry import Telemetry, format_summary
+from .timeline import Mask
+from .track import TRACKERS, track_masks
+
+EXIT_OK = 0
+EXIT_FAILED = 1       # at least one input failed
+EXIT_USAGE = 2        # bad arguments or mask file
+EXIT_NO_INPUT = 3     # no input files matched
+EXIT_CANCELLED = 130  # interrupted
+
+
+def parse_rect(text):
+    try:
+        rect = tuple(int(v) for v in text.split(','))
+    except ValueError:
+        rect = ()
+    if len(rect) != 4:
+        raise argparse.ArgumentTypeError(f'expected x1,y1,x2,y2, got {text!r}')
+    return rect
+
+
+def load_masks(path):
+    # A list of masks in video pixels, bare or under "masks". Each is either
+    # [x1, y1, x2, y2] or {"rect": [...], "start": f, "end": f, "keyframes": [[f, [...]], ...]}
+    with open(path) as f:
+        if path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError('PyYAML is required for YAML mask files (pip install pyyaml)')
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('masks', [])
+    masks = []
+    for item in data:
+        if isinstance(item, dict):
+            masks.append(Mask.from_dict(item))
+        elif len(item) == 4:
+            masks.append(tuple(int(v) for v in item))
+        else:
+            raise ValueError(f'{path}: mask must have 4 coordinates, got {item!r}')
+    return masks
+
+
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def output_path(src, output, suffix, batch):
+    stem, ext = os.path.splitext(os.path.basename(src))
+    if output and not batch and not os.path.isdir(output):
+        return output
+    folder = output or os.path.dirname(src)
+    return os.path.join(folder, f'{stem}{suffix}{ext}')
+
+
+def project_defaults(settings):
+    # Project settings as argparse defaults, so command line flags override them
+    defaults = {}
+    for key, value in settings.items():
+        if key == 'renderer':
+            defaults['smart'] = value == 'smart'
+            defaults['resume'] = value == 'resumable'
+        elif key == 'max_memory_mb':
+            defaults['max_memory'] = value
+        else:
+            defaults[key] = value
+    return defaults
+
+
+def project_settings(args):
+    renderer = 'smart' if args.smart else 'resumable' if args.resume else 'standard'
+    return dict(mode=args.mode, algorithm=args.algorithm, radius=args.radius,
+                cache_size=args.cache_size, cache_tolerance=args.cache_tolerance,
+                pyramid_scale=args.pyramid_scale, pyramid_band=args.pyramid_band,
+                workers=args.workers, backend=args.backend, max_memory_mb=args.max_memory,
+                renderer=renderer, codec=args.codec)
+
+
+def telemetry_path(path, src, batch):
+    # One trace or profile per input in batch runs: trace.jsonl becomes
+    # trace-<input name>.jsonl
+    if not path or not batch:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}-{os.path.splitext(os.path.basename(src))[0]}{ext}'
+
+
+def progress_fields(snap):
+    done = snap['done'] or 1
+    return {
+        'frame': snap['done'],
+        'total': snap['total'],
+        'fps': round(snap['fps'], 2),
+        'eta': round(snap['eta'], 1) if snap['eta'] is not None else None,
+        'stage_ms': {k: round(v / done * 1000, 2) for k, v in snap['stages'].items()},
+    }
+
+
+def emit(event, **fields):
+    sys.stdout.write(json.dumps(dict(event=event, **fields)) + '\n')
+    sys.stdout.flush()
+
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog='python -m vtr',
+        description='Remove text from videos by inpainting rectangular masks. '
+                    'Progress is printed as JSON lines on stdout.')
+    p.add_argument('inputs', nargs='*',
+                   help="input videos or glob patterns (default: the --project's source video)")
+    p.add_argument('-o', '--output',
+                   help='output file, or output directory when several inputs are given')
+    p.add_argument('--suffix', default='_clean',
+                   help='file name suffix for outputs written to a directory (default: _clean)')
+    p.add_argument('-r', '--rect', action='append', type=parse_rect, default=[],
+                   metavar='X1,Y1,X2,Y2', help='mask rectangle in video pixels, repeatable')
+    p.add_argument('-m', '--masks', help='JSON or YAML file with mask rectangles')
+    p.add_argument('-p', '--project',
+                   help='project file (saved from the GUI or with --save-project) giving masks, '
+                        'settings and cached analysis; masks are scaled to inputs of another size '
+                        'and flags given here override its settings')
+    p.add_argument('--save-project', metavar='FILE',
+                   help="save the first input's masks (after --track/--detect) and these settings "
+                        'as a project file')
+    p.add_argument('--detect', choices=DETECTORS,
+                   help='also mask text found automatically in each input; auto uses a DB or '
+                        'EAST model from VTR_MODEL_DIR or ./models when present, else edge density')
+    p.add_argument('--detect-seconds', type=float, default=SAMPLE_SECONDS,
+                   help=f'seconds between frames sampled by --detect (default: {SAMPLE_SECONDS})')
+    p.add_argument('--text-model', metavar='PATH', help='EAST or DB model file for --detect')
+    p.add_argument('--track', choices=TRACKERS,
+                   help='make each --rect/--masks mask without keyframes follow its text, tracked '
+                        'forward from its start frame until the text is lost')
+    p.add_argument('-c', '--codec', default=DEFAULT_CODEC,
+                   help=f'four character codec code (default: {DEFAULT_CODEC})')
+    p.add_argument('--mode', choices=InpaintEngine.MODES, default='roi')
+    p.add_argument('--algorithm', choices=list(ALGORITHMS) + [AUTO], default=DEFAULT_ALGORITHM,
+                   help='inpainting algorithm; auto benchmarks the candidates on sampled frames '
+                        f'and picks the fastest one that meets --auto-min-psnr (default: {DEFAULT_ALGORITHM})')
+    p.add_argument('--auto-min-psnr', type=float, default=DEFAULT_MIN_PSNR,
+                   help=f'quality threshold for --algorithm auto, in dB against TELEA '
+                        f'(default: {DEFAULT_MIN_PSNR})')
+    p.add_argument('--radius', type=int, default=INPAINT_RADIUS,
+                   help=f'inpainting radius in pixels (default: {INPAINT_RADIUS})')
+    p.add_argument('--pyramid-scale', type=float, default=DEFAULT_SCALE,
+                   help=f'downscale factor for --mode pyramid, 1 = full resolution '
+                        f'(default: {DEFAULT_SCALE})')
+    p.add_argument('--pyramid-band', type=int,
+                   help='border band in pixels re-inpainted at full resolution in pyramid mode '
+                        '(default: twice the radius)')
+    p.add_argument('--check-quality', action='store_true',
+                   help='instead of processing, compare the chosen mode against full-resolution '
+                        'ROI inpainting on sampled frames and print PSNR, SSIM and speedup')
+    p.add_argument('--quality-samples', type=int, default=DEFAULT_SAMPLES,
+                   help=f'frames sampled by --check-quality (default: {DEFAULT_SAMPLES})')
+    p.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                   help=f'inpainted patches kept for unchanged ROI content, 0 disables '
+                        f'(default: {DEFAULT_CACHE_SIZE})')
+    p.add_argument('--cache-tolerance', type=float, default=0.0,
+                   help='reuse a patch when the ROI differs by at most this mean absolute '
+                        'pixel difference (default: 0, exact matches only)')
+    p.add_argument('-j', '--workers', type=int, help='inpaint workers (default: CPU count)')
+    p.add_argument('--backend', choices=FramePipeline.BACKENDS, default='thread')
+    p.add_argument('--max-memory', type=float, metavar='MB',
+                   help='cap on the memory taken by decoded frames in flight, per input; the '
+                        'peak RSS is reported in the done event')
+    p.add_argument('--segments', type=int, default=0,
+                   help='split the video into N ranges processed in parallel processes '
+                        'and joined without re-encoding (needs ffmpeg)')
+    p.add_argument('--smart', action='store_true',
+                   help='only re-encode GOPs containing masked frames and stream-copy the rest '
+                        '(needs ffmpeg, plus ffprobe or PyAV)')
+    p.add_argument('--resume', action='store_true',
+                   help='write the output in parts with a manifest next to it, and continue '
+                        'after the last finished part when run again (needs ffmpeg)')
+    p.add_argument('--segment-frames', type=int, default=DEFAULT_SEGMENT_FRAMES,
+                   help=f'frames per part with --resume (default: {DEFAULT_SEGMENT_FRAMES})')
+    p.add_argument('--retries', type=int, default=2, help='retries per failed segment (default: 2)')
+    p.add_argument('--telemetry', action='store_true',
+                   help='time every frame and add per-stage histograms (mean, p50, p95, p99, '
+                        'max), masked pixels and cache hits to the done event')
+    p.add_argument('--trace', metavar='FILE',
+                   help='write one JSON line per frame with its stage times, masked pixels and '
+                        'cache hits (implies --telemetry; per input in batch runs)')
+    p.add_argument('--profile', metavar='FILE',
+                   help='run the decode, encode and inpaint threads under cProfile and write '
+                        'the stats to FILE (implies --telemetry; per input in batch runs)')
+    p.add_argument('--skip-existing', action='store_true', help='skip inputs whose output exists')
+    p.add_argument('--progress-interval', type=float, default=1.0,
+                   help='seconds between progress events (default: 1.0)')
+    p.add_argument('-v', '--verbose', action='store_true',
+                   help='also log progress and stage timings to stderr')
+    return p
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    project = None
+    if args.project:
+        try:
+            project = Project.load(args.project)
+        except ProjectError as e:
+            emit('error', message=str(e))
+            return EXIT_USAGE
+        parser.set_defaults(**project_defaults(project.settings))
+        args = parser.parse_args(argv)
+
+    masks = list(args.rect)
+    if args.masks:
+        try:
+            masks += load_masks(args.masks)
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            emit('error', message=f'Could not load masks: {e}')
+            return EXIT_USAGE
+    if not masks and not args.detect and not (project and project.masks):
+        emit('error', message='No mask rectangles given (use --rect, --masks, --project or --detect)')
+        return EXIT_USAGE
+
+    if sum(map(bool, (args.smart, args.segments, args.resume))) > 1:
+        emit('error', message='--smart, --segments and --resume cannot be combined')
+        return EXIT_USAGE
+
+    patterns = args.inputs or ([project.source] if project and project.source else [])
+    inputs = expand_inputs(patterns)
+    if not inputs:
+        emit('error', message='No input files matched')
+        return EXIT_NO_INPUT
+    batch = len(inputs) > 1
+    if batch and args.output and not os.path.isdir(args.output):
+        os.makedirs(args.output, exist_ok=True)
+
+    cancelled = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: cancelled.set())
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, lambda *_: cancelled.set())
+
+    log_progress = None
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                            format='%(asctime)s %(levelname)s %(message)s')
+        log_progress = logging_listener()
+
+    engine_options = dict(mode=args.mode, radius=args.radius, cache_size=args.cache_size,
+                          cache_tolerance=args.cache_tolerance, pyramid_scale=args.pyramid_scale,
+                          pyramid_band=args.pyramid_band, algorithm=args.algorithm,
+                          auto_min_psnr=args.auto_min_psnr)
+    failed = 0
+
+    def masks_for(src):
+        # The project's and the given masks, tracked when asked, plus any
+        # text detected in this input. The project's own source reuses its
+        # cached probe and detections.
+        own_source = project is not None and project.source is not None and \
+            os.path.abspath(src) == os.path.abspath(project.source)
+        src_masks = list(masks)
+        if own_source:
+            # Seeds the index used by tracking, detection, segments and resume
+            project.frame_index(build=False)
+        if project and project.masks:
+            if own_source:
+                info = project.probe()
+            else:
+                cap, info = open_video(src)
+                cap.release()
+            src_masks = project.masks_for(info.size) + src_masks
+        if args.track and src_masks:
+            src_masks = track_masks(src, src_masks, args.track, cancel=cancelled.is_set)
+            emit('tracked', input=src, masks=[m.to_dict() for m in src_masks])
+        if args.detect:
+            key = {'method': args.detect, 'model': args.text_model,
+                   'sample_seconds': args.detect_seconds}
+            cached = project.cached('detections', key) if own_source else None
+            if cached is not None:
+                found = [Mask.from_dict(d) for d in cached]
+            else:
+                found = detect_text(src, args.detect, model=args.text_model,
+                                    sample_seconds=args.detect_seconds, cancel=cancelled.is_set)
+            emit('detected', input=src, masks=[m.to_dict() for m in found])
+            src_masks += found
+        if args.save_project and src == inputs[0]:
+            save_project(src, src_masks, found if args.detect else None)
+        return src_masks
+
+    def save_project(src, src_masks, found):
+        new = Project(src, src_masks, project_settings(args))
+        new.probe()
+        if found is not None:
+            new.store('detections', {'method': args.detect, 'model': args.text_model,
+                                     'sample_seconds': args.detect_seconds},
+                      [m.to_dict() for m in found])
+        index = new.frame_index(cancelled.is_set)
+        new.plan_summary(index.frame_count if index else new.fingerprint['frames'])
+        new.save(args.save_project)
+        emit('project', input=src, path=args.save_project, masks=len(src_masks))
+
+    if args.check_quality:
+        for src in inputs:
+            try:
+                src_masks = masks_for(src)
+                options, _ = resolve_algorithm(src, src_masks, engine_options)
+                report = check_quality(src, src_masks, args.quality_samples,
+                                       reference={'mode': 'roi', 'radius': args.radius},
+                                       **options)
+            except Exception as e:
+                failed += 1
+                emit('error', input=src, message=str(e))
+                continue
+            emit('quality', input=src, mode=args.mode, algorithm=options['algorithm'], **report)
+        return EXIT_FAILED if failed else EXIT_OK
+
+    for src in inputs:
+        if cancelled.is_set():
+            break
+        dst = output_path(src, args.output, args.suffix, batch)
+        if args.skip_existing and os.path.exists(dst):
+            emit('skipped', input=src, output=dst)
+            continue
+
+        def on_progress(snap, src=src):
+            emit('progress', input=src, **progress_fields(snap))
+            if log_progress:
+                log_progress(snap)
+
+        emit('start', input=src, output=dst)
+        started = time.monotonic()
+        telemetry = None
+        if args.telemetry or args.trace or args.profile:
+            telemetry = Telemetry(telemetry_path(args.trace, src, batch),
+                                  telemetry_path(args.profile, src, batch))
+        try:
+            src_masks = masks_for(src)
+            if not src_masks:
+                emit('skipped', input=src, output=dst, reason='no text found')
+                continue
+            options, report = resolve_algorithm(src, src_masks, engine_options)
+            if report:
+                emit('algorithm', input=src, chosen=options['algorithm'], candidates=report)
+            if args.smart:
+                result = smart_render(src, dst, src_masks, workers=args.workers,
+                                      backend=args.backend, cancel=cancelled.is_set,
+                                      progress=on_progress,
+                                      progress_interval=args.progress_interval,
+                                      max_memory_mb=args.max_memory, telemetry=telemetry,
+                                      **options)
+            elif args.resume:
+                result = process_video_resumable(src, dst, src_masks,
+                                                 segment_frames=args.segment_frames,
+                                                 codec=args.codec, workers=args.workers,
+                                                 backend=args.backend, cancel=cancelled.is_set,
+                                                 progress=on_progress,
+                                                 progress_interval=args.progress_interval,
+                                                 max_memory_mb=args.max_memory,
+                                                 telemetry=telemetry, **options)
+            elif args.segments:
+                result = process_video_segmented(src, dst, src_masks, segments=args.segments,
+                                                 codec=args.codec, retries=args.retries,
+                                                 workers=args.workers,
+                                                 cancel=cancelled.is_set, progress=on_progress,
+                                                 progress_interval=args.progress_interval,
+                                                 max_memory_mb=args.max_memory,
+                                                 telemetry=telemetry, **options)
+            else:
+                result = process_video(src, dst, src_masks, codec=args.codec, workers=args.workers,
+                                       backend=args.backend, cancel=cancelled.is_set,
+                                       progress=on_progress,
+                                       progress_interval=args.progress_interval,
+                                       max_memory_mb=args.max_memory, telemetry=telemetry,
+                                       **options)
+        except Exception as e:
+            failed += 1
+            emit('error', input=src, message=str(e))
+            continue
+        finally:
+            if telemetry:
+                telemetry.close()
+        if result.cancelled:
+            emit('cancelled', input=src, frame=result.frames, total=result.total)
+            break
+        emit('done', input=src, output=dst, frames=result.frames,
+             passed_through=result.passed_through, **result.stats,
+             fps=round(result.timing.get('fps', 0.0), 2),
+             stage_seconds={k: round(v, 3) for k, v in result.timing.get('stages', {}).items()},
+             seconds=round(time.monotonic() - started, 3), peak_rss_mb=result.peak_rss_mb,
+             **({'telemetry': telemetry.summary()} if telemetry else {}))
+        if telemetry and args.verbose:
+            for line in format_summary(telemetry.summary()):
+                logging.getLogger('vtr').info('%s', line)
+
+    if cancelled.is_set():
+        return EXIT_CANCELLED
+    return EXIT_FAILED if failed else EXIT_OK
@@ -0,0 +1,235 @@
+import os
+
+import cv2
+import numpy as np
+
+from . import store
+from .index import load_index, seek, seek_saves
+from .plan import merge_boxes
+from .processing import open_video
+from .progress import DEFAULT_INTERVAL, ProgressTracker
+from .timeline import Mask
+
+DETECTORS = ('auto', 'edges', 'mser', 'east', 'db')
+# OpenCV's published text detection models, looked up by file name
+MODEL_FILES = {
+    'db': ('DB_TD500_resnet50.onnx', 'DB_IC15_resnet50.onnx',
+           'DB_TD500_resnet18.onnx', 'DB_IC15_resnet18.onnx'),
+    'east': ('frozen_east_text_detection.pb',),
+}
+SAMPLE_SECONDS = 1.0   # time between sampled frames
+MIN_HITS = 2           # samples a region must appear on to become a mask
+MASK_PAD = 4           # pixels added around detected text
+CACHE_VERSION = 1
+
+
+def model_dirs():
+    dirs = [os.environ.get('VTR_MODEL_DIR'), os.path.join(os.getcwd(), 'models'),
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models'),
+            os.path.join(store.cache_dir(), 'models')]
+    return [d for d in dirs if d]
+
+
+def find_model(kind):
+    for folder in model_dirs():
+        for name in MODEL_FILES[kind]:
+            path = os.path.join(folder, name)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def _line_boxes(binary, min_fill=0.0, max_fill=1.0):
+    # Close gaps between characters so each caption line becomes one blob,
+    # then keep blobs shaped like a line of text
+    h, w = binary.shape
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, w // 60), max(1, h // 240)))
+    closed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
+    for contour in contours:
+        x, y, bw, bh = cv2.boundingRect(contour)
+        if bh < h * 0.015 or bh > h * 0.25 or bw < bh * 1.5:
+            continue
+        fill = cv2.countNonZero(binary[y:y+bh, x:x+bw]) / (bw * bh)
+        if min_fill <= fill <= max_fill:
+            boxes.append((x, y, x + bw, y + bh))
+    return boxes
+
+
+def detect_edges(frame):
+    # Captions are dense clusters of strong edges: morphological gradient,
+    # thresholded at Otsu's level but never below a fixed contrast
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    grad = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT,
+                            cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    level, _ = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    _, binary = cv2.threshold(grad, max(level, 60), 255, cv2.THRESH_BINARY)
+    return _line_boxes(binary, min_fill=0.15, max_fill=0.85)
+
+
+def detect_mser(frame):
+    # Stable regions the size and shape of glyphs, grouped into lines
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    mser = cv2.MSER_create()
+    mser.setMinArea(max(8, h * w // 200000))
+    mser.setMaxArea(h * w // 200)
+    _, bboxes = mser.detectRegions(gray)
+    binary = np.zeros((h, w), np.uint8)
+    for x, y, bw, bh in bboxes:
+        if h * 0.008 < bh < h * 0.2 and 0.1 < bw / bh < 3:
+            binary[y:y+bh, x:x+bw] = 255
+    return _line_boxes(binary, min_fill=0.3)
+
+
+def join_lines(boxes):
+    # Joins boxes on the same text line (mostly overlapping rows) whose
+    # horizontal gap is under the line height, e.g. separate words
+    boxes = sorted(boxes)
+    out = []
+    for box in boxes:
+        for i, o in enumerate(out):
+            overlap = min(o[3], box[3]) - max(o[1], box[1])
+            height = min(o[3] - o[1], box[3] - box[1])
+            if overlap > height / 2 and box[0] - o[2] < height:
+                out[i] = (min(o[0], box[0]), min(o[1], box[1]), max(o[2], box[2]), max(o[3], box[3]))
+                break
+        else:
+            out.append(box)
+    return out
+
+
+class TextDetector:
+    # One of DETECTORS. 'auto' uses the DB model, then EAST, when the model
+    # file is found in model_dirs(), and edge density otherwise.
+    def __init__(self, method='auto', model=None):
+        if method not in DETECTORS:
+            raise ValueError(f'Unknown text detector: {method}')
+        if method == 'auto':
+            method = next((k for k in ('db', 'east') if model or find_model(k)), 'edges')
+        if method in MODEL_FILES:
+            model = model or find_model(method)
+            if not model:
+                raise ValueError(f"No {method.upper()} model found; put {MODEL_FILES[method][0]} "
+                                 f"in one of: {', '.join(model_dirs())}")
+        self.method = method
+        self.model = model
+        self._net = None
+        self._net_size = None
+
+    def _dnn(self, frame):
+        h, w = frame.shape[:2]
+        # Network input keeps the aspect ratio, in multiples of 32
+        size = (640, max(32, int(round(640 * h / w / 32)) * 32))
+        if self._net is None or self._net_size != size:
+            if self.method == 'east':
+                net = cv2.dnn.TextDetectionModel_EAST(self.model)
+                net.setConfidenceThreshold(0.5)
+                net.setNMSThreshold(0.4)
+                net.setInputParams(1.0, size, (123.68, 116.78, 103.94), True)
+            else:
+                net = cv2.dnn.TextDetectionModel_DB(self.model)
+                net.setBinaryThreshold(0.3)
+                net.setPolygonThreshold(0.5)
+                net.setUnclipRatio(2.0)
+                net.setInputParams(1.0 / 255, size, (122.67891434, 116.66876762, 104.00698793))
+            self._net, self._net_size = net, size
+        quads, _ = self._net.detect(frame)
+        boxes = []
+        for quad in quads:
+            x, y, bw, bh = cv2.boundingRect(np.asarray(quad, dtype=np.int32))
+            boxes.append((max(x, 0), max(y, 0), min(x + bw, w), min(y + bh, h)))
+        return boxes
+
+    def detect(self, frame):
+        # (x1, y1, x2, y2) text boxes in one frame
+        if self.method == 'edges':
+            boxes = detect_edges(frame)
+        elif self.method == 'mser':
+            boxes = detect_mser(frame)
+        else:
+            boxes = self._dnn(frame)
+        return join_lines(merge_boxes(boxes))
+
+
+def _iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def group_detections(samples, step, total, frame_size, min_hits=MIN_HITS, pad=MASK_PAD):
+    # Links boxes across sampled frames (one missed sample allowed) and
+    # turns every region seen on at least min_hits samples into a Mask over
+    # its padded union, covering the frames up to the neighbouring samples
+    tracks = []
+    for idx, boxes in samples:
+        for box in boxes:
+            live = [t for t in tracks if t['last'] >= idx - 2 * step and t['last'] < idx]
+            match = max(live, key=lambda t: _iou(t['box'], box), default=None)
+            if match and _iou(match['box'], box) >= 0.3:
+                u = match['union']
+                match['union'] = (min(u[0], box[0]), min(u[1], box[1]),
+                                  max(u[2], box[2]), max(u[3], box[3]))
+                match['box'], match['last'] = box, idx
+                match['hits'] += 1
+            else:
+                tracks.append({'box': box, 'union': box, 'first': idx, 'last': idx, 'hits': 1})
+    w, h = frame_size
+    masks = []
+    for t in tracks:
+        if t['hits'] < min_hits:
+            continue
+        x1, y1, x2, y2 = t['union']
+        rect = (max(x1 - pad, 0), max(y1 - pad, 0), min(x2 + pad, w), min(y2 + pad, h))
+        masks.append(Mask(rect, max(t['first'] - step + 1, 0), min(t['last'] + step, total)))
+    return masks
+
+
+def detect_text(path, method='auto', model=None, sample_seconds=SAMPLE_SECONDS,
+                min_hits=MIN_HITS, pad=MASK_PAD, use_cache=True, cancel=None, progress=None,
+                progress_interval=DEFAULT_INTERVAL):
+    # Time-ranged masks for the text found on frames sampled every
+    # sample_seconds. Results are cached on disk by file and settings, so
+    # running it again (or on every job of a batch) costs nothing.
+    cancel = cancel or (lambda: False)
+    detector = TextDetector(method, model)
+    cap, info = open_video(path)
+    try:
+        key = store.file_key(path, CACHE_VERSION, detector.method, detector.model,
+                             sample_seconds, min_hits, pad)
+        cached = store.load('detect', key) if use_cache else None
+        if cached is not None:
+            return [Mask.from_dict(d) for d in cached['masks']]
+
+        # grab() still decodes the frames it skips, so with keyframes known,
+        # samples a GOP or more ahead are reached by seeking instead and
+        # only the GOPs holding samples are decoded
+        index = load_index(path, cancel)
+        total = index.frame_count if index else info.frame_count
+        step = max(1, int(round((info.fps or 25) * sample_seconds)))
+        tracker = ProgressTracker(total, [progress], progress_interval)
+        samples = []
+        idx = pos = 0  # next sample, and the frame the capture reads next
+        while not cancel():
+            if seek_saves(index, pos, idx):
+                seek(cap, index, idx)
+            else:
+                while pos < idx and cap.grab():
+                    pos += 1
+            ret, frame = cap.read()
+            if not ret:
+                break
+            pos = idx + 1
+            samples.append((idx, detector.detect(frame)))
+            idx += step
+            tracker.set_done(min(idx, total))
+    finally:
+        cap.release()
+    masks = group_detections(samples, step, total or idx, info.size, min_hits, pad)
+    if use_cache and not cancel():
+        store.save('detect', key, {'masks': [m.to_dict() for m in masks]})
+    return masks
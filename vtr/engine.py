@@ -0,0 +1,127 @@
+import numpy as np
+
+from .algorithms import DEFAULT_ALGORITHM, get_algorithm
+from .plan import MaskPlan
+from .pyramid import DEFAULT_SCALE, PyramidInpaint
+from .temporal import SCENE_THRESHOLD, TemporalFill
+from .timeline import MaskTimeline, TimelinePlan
+
+INPAINT_RADIUS = 3
+
+
+class InpaintEngine:
+    # 'roi' inpaints padded crops around the masks, 'full' is the reference
+    # full-frame path the ROI output can be checked against, 'temporal'
+    # fills from a background model of earlier frames (see TemporalFill),
+    # 'pyramid' inpaints ROIs at reduced resolution (see PyramidInpaint)
+    MODES = ('roi', 'full', 'temporal', 'pyramid')
+
+    def __init__(self, radius=INPAINT_RADIUS, algorithm=DEFAULT_ALGORITHM, mode='roi',
+                 scene_threshold=SCENE_THRESHOLD, cache=None, pyramid_scale=DEFAULT_SCALE,
+                 pyramid_band=None):
+        if mode not in self.MODES:
+            raise ValueError(f'Unknown inpaint mode: {mode}')
+        self.radius = radius
+        # A vtr.algorithms name; every mode inpaints with it
+        self.algorithm = algorithm
+        self.inpaint = get_algorithm(algorithm)
+        self.mode = mode
+        self.temporal = (TemporalFill(radius, self.inpaint, scene_threshold)
+                         if mode == 'temporal' else None)
+        self.pyramid = (PyramidInpaint(radius, self.inpaint, pyramid_scale, pyramid_band)
+                        if mode == 'pyramid' else None)
+        # Optional InpaintCache, used by the 'roi' and 'pyramid' modes
+        self.cache = cache
+
+    @property
+    def stateful(self):
+        # Stateful engines need every frame, in order, on a single worker
+        return self.temporal is not None
+
+    def observe(self, frame):
+        # Called instead of apply() for frames with no active mask
+        if self.temporal is not None:
+            self.temporal.observe(frame)
+        return frame
+
+    @property
+    def pad(self):
+        # TELEA/NS look one pixel past the radius, so this keeps crops exact
+        return self.radius + 1
+
+    def compile(self, rects, frame_size):
+        return MaskPlan(rects, frame_size, self.pad)
+
+    def compile_timeline(self, masks, frame_size):
+        # masks: plain rects (always active) and/or timeline Mask objects
+        if not isinstance(masks, MaskTimeline):
+            masks = MaskTimeline(masks)
+        if self.temporal is not None:
+            self.temporal.track(masks.extents(frame_size, self.pad), frame_size)
+        return TimelinePlan(masks, frame_size, self.pad)
+
+    def new_scratch(self, plan, channels=3):
+        # The frame-sized buffer is only allocated for the full-frame mode
+        return plan.new_scratch(channels, full=self.mode == 'full')
+
+    def apply(self, frame, plan, scratch=None, record=None):
+        # Hot path: no per-rectangle work and, given scratch buffers from
+        # new_scratch(), no allocation. The frame is edited in place. A
+        # telemetry record dict gets the number of ROIs served from the cache.
+        if self.temporal is not None:
+            return self.temporal.apply(frame, plan)
+        if scratch is None:
+            scratch = self.new_scratch(plan, frame.shape[2])
+        roi_bufs, full_buf = scratch
+
+        if self.mode == 'full':
+            self.inpaint(frame, plan.mask, self.radius, full_buf)
+            frame[...] = full_buf
+            return frame
+
+        cache = self.cache
+        pyramid = self.pyramid
+        inpaint = self.inpaint
+        hits = 0
+        for (sy, sx, mask), roi_key, buf in zip(plan.rois, plan.roi_keys, roi_bufs):
+            crop = frame[sy, sx]
+            if cache is not None:
+                patch, token = cache.lookup(roi_key, crop)
+                if patch is not None:
+                    if cache.tolerance:
+                        # Matched a similar crop, not this one: keep this
+                        # frame's unmasked pixels
+                        np.copyto(crop, patch, where=mask[..., None] > 0)
+                    else:
+                        crop[...] = patch
+                    hits += 1
+                    continue
+            if pyramid is not None:
+                pyramid.inpaint(crop, mask, buf, roi_key)
+            else:
+                inpaint(crop, mask, self.radius, buf)
+            if cache is not None:
+                cache.store(token, crop, buf)
+            crop[...] = buf
+        if record is not None and cache is not None:
+            record['cache_hits'] = hits
+        return frame
+
+    def stats(self):
+        stats = {}
+        if self.cache is not None:
+            stats['cache_hits'] = self.cache.hits
+            stats['cache_misses'] = self.cache.misses
+        return stats
+
+    def add_stats(self, stats):
+        # Counters from a copy of this engine in a worker process, whose
+        # cache is its own
+        if self.cache is not None:
+            self.cache.hits += stats.get('cache_hits', 0)
+            self.cache.misses += stats.get('cache_misses', 0)
+
+    def process(self, frame, rects):
+        # Convenience for one-off frames; jobs should compile() once instead
+        h, w = frame.shape[:2]
+        return self.apply(frame, self.compile(rects, (w, h)))
@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import subprocess
+
+import cv2
+
+from .processing import VideoError
+
+
+def ffmpeg_path():
+    return shutil.which('ffmpeg')
+
+
+def ffprobe_path():
+    return shutil.which('ffprobe')
+
+
+def require_ffmpeg(feature):
+    path = ffmpeg_path()
+    if not path:
+        raise VideoError(f'{feature} needs ffmpeg on PATH')
+    return path
+
+
+def run(args):
+    proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        err = proc.stderr.decode(errors='replace').strip().splitlines()
+        raise VideoError(f'{os.path.basename(args[0])} failed: {err[-1] if err else proc.returncode}')
+    return proc.stdout
+
+
+def probe_frames(path):
+    # Returns (frame_count, duration_seconds) of the first video stream.
+    # ffprobe counts packets exactly; without it fall back to decoding.
+    probe = ffprobe_path()
+    if probe:
+        out = run([probe, '-v', 'error', '-select_streams', 'v:0', '-count_packets',
+                   '-show_entries', 'stream=nb_read_packets,duration:format=duration',
+                   '-of', 'json', path])
+        data = json.loads(out)
+        stream = data['streams'][0]
+        duration = stream.get('duration') or data.get('format', {}).get('duration') or 0
+        return int(stream['nb_read_packets']), float(duration)
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise VideoError(f'Could not open video file: {path}')
+    frames = 0
+    while cap.grab():
+        frames += 1
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return frames, frames / fps if fps else 0.0
+
+
+def concat(parts, dst, durations=None):
+    # Stream-copy the parts into one container without re-encoding. Known
+    # part durations are written to the list so B-frame start offsets in a
+    # part cannot shift the parts after it.
+    exe = require_ffmpeg('Joining segments')
+    listing = dst + '.concat.txt'
+    with open(listing, 'w') as f:
+        for i, part in enumerate(parts):
+            path = os.path.abspath(part).replace("'", "'\\''")
+            f.write(f"file '{path}'\n")
+            if durations:
+                f.write(f'duration {durations[i]:.6f}\n')
+    try:
+        run([exe, '-y', '-v', 'error', '-f', 'concat', '-safe', '0', '-i', listing,
+             '-map', '0', '-c', 'copy', dst])
+    finally:
+        os.remove(listing)
+
+
+def _load_av():
+    try:
+        import av
+    except ImportError:
+        return None
+    return av
+
+
+def probe_stream(path):
+    # Codec parameters of the first video stream, via ffprobe or PyAV
+    probe = ffprobe_path()
+    if probe:
+        out = run([probe, '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+                   'stream=codec_name,pix_fmt,width,height,avg_frame_rate', '-of', 'json', path])
+        s = json.loads(out)['streams'][0]
+        num, _, den = s.get('avg_frame_rate', '0/1').partition('/')
+        fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+        return {'codec': s['codec_name'], 'pix_fmt': s.get('pix_fmt'),
+                'width': s['width'], 'height': s['height'], 'fps': fps}
+    av = _load_av()
+    if av is None:
+        raise VideoError('Probing streams needs ffprobe on PATH or PyAV (pip install av)')
+    with av.open(path) as c:
+        s = c.streams.video[0]
+        return {'codec': s.codec_context.name, 'pix_fmt': s.codec_context.pix_fmt,
+                'width': s.codec_context.width, 'height': s.codec_context.height,
+                'fps': float(s.average_rate or 0)}
+
+
+def probe_packets(path):
+    # Keyframe flags of the first video stream's packets in decode order,
+    # read without decoding
+    probe = ffprobe_path()
+    if probe:
+        out = run([probe, '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+                   'packet=flags', '-of', 'csv=p=0', path])
+        return [line.startswith('K') for line in out.decode().split()]
+    av = _load_av()
+    if av is None:
+        raise VideoError('Probing packets needs ffprobe on PATH or PyAV (pip install av)')
+    with av.open(path) as c:
+        stream = c.streams.video[0]
+        return [p.is_keyframe for p in c.demux(stream) if p.size]
+
+
+class FFmpegWriter:
+    # cv2.VideoWriter-like sink that pipes raw BGR frames into ffmpeg
+    def __init__(self, path, size, fps, args):
+        exe = require_ffmpeg('Encoding with ffmpeg')
+        w, h = size
+        self.proc = subprocess.Popen(
+            [exe, '-y', '-v', 'error', '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+             '-s', f'{w}x{h}', '-r', repr(fps), '-i', '-'] + list(args) + [path],
+            stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frame):
+        self.proc.stdin.write(memoryview(frame if frame.flags.c_contiguous else frame.copy()))
+
+    def release(self):
+        if self.proc.stdin.closed:
+            return
+        self.proc.stdin.close()
+        err = self.proc.stderr.read().decode(errors='replace').strip()
+        if self.proc.wait() != 0:
+            raise VideoError(f'ffmpeg encode failed: {err.splitlines()[-1] if err else self.proc.returncode}')
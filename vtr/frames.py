@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from .index import seek
+from .processing import VideoError
+
+DEFAULT_CACHE_MB = 512
+DEFAULT_PREFETCH = 8
+
+
+class FrameServer:
+    # Random access to decoded frames for the navigator: an LRU of decoded
+    # frames bounded by cache_mb, sequential reads instead of seeks when
+    # stepping forward, and a background thread that decodes the frames
+    # around the last requested position. Returned frames are shared with
+    # the cache and must not be modified. Until set_index() is given the
+    # video's FrameIndex, frame_count is the container's estimate and seeks
+    # are OpenCV's, which can land a few frames off on some files.
+    def __init__(self, path, cache_mb=DEFAULT_CACHE_MB, prefetch=DEFAULT_PREFETCH, index=None):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise VideoError(f'Could not open video file: {path}')
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.index = None
+        self.budget = cache_mb * 1024 * 1024
+        self.prefetch = prefetch
+        self.hits = self.misses = 0
+        self._frames = OrderedDict()
+        self._bytes = 0
+        self._pos = 0  # index the capture will decode next
+        self._lock = threading.Lock()
+        self._wanted = threading.Condition(threading.Lock())
+        self._target = None
+        self._generation = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._prefetch_loop, name='prefetch', daemon=True)
+        self._thread.start()
+        if index is not None:
+            self.set_index(index)
+
+    def set_index(self, index):
+        # Exact frame count and keyframe seeks from now on
+        with self._lock:
+            self.index = index
+            self.frame_count = index.frame_count
+
+    def _store(self, idx, frame):
+        if idx in self._frames:
+            self._frames.move_to_end(idx)
+            return
+        self._frames[idx] = frame
+        self._bytes += frame.nbytes
+        while self._bytes > self.budget and len(self._frames) > 1:
+            _, old = self._frames.popitem(last=False)
+            self._bytes -= old.nbytes
+
+    def _decode(self, idx):
+        # Caller holds self._lock. Reads forward when the capture is already
+        # at idx, otherwise seeks.
+        if idx != self._pos:
+            seek(self.cap, self.index, idx)
+        ret, frame = self.cap.read()
+        if not ret:
+            self._pos = -1
+            return None
+        self._pos = idx + 1
+        self._store(idx, frame)
+        return frame
+
+    def get(self, idx):
+        if not 0 <= idx < self.frame_count:
+            return None
+        with self._lock:
+            frame = self._frames.get(idx)
+            if frame is not None:
+                self._frames.move_to_end(idx)
+                self.hits += 1
+            else:
+                self.misses += 1
+                frame = self._decode(idx)
+        with self._wanted:
+            self._target = idx
+            self._generation += 1
+            self._wanted.notify()
+        return frame
+
+    def _prefetch_loop(self):
+        while True:
+            with self._wanted:
+                while self._target is None and not self._closed:
+                    self._wanted.wait()
+                if self._closed:
+                    return
+                idx, generation = self._target, self._generation
+                self._target = None
+
+            # Forward frames first, read sequentially from idx, then the
+            # frames before idx with a single seek
+            ahead = range(idx + 1, min(idx + 1 + self.prefetch, self.frame_count))
+            behind = range(max(idx - self.prefetch // 2, 0), idx)
+            for i in list(ahead) + list(behind):
+                if self._generation != generation or self._closed:
+                    break
+                with self._lock:
+                    if i not in self._frames and self._decode(i) is None:
+                        break
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'cached_frames': len(self._frames), 'cached_mb': self._bytes / 1024 / 1024}
+
+    def close(self):
+        with self._wanted:
+            self._closed = True
+            self._wanted.notify()
+        self._thread.join()
+        with self._lock:
+            self.cap.release()
+            self._frames.clear()
+            self._bytes = 0
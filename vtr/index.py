@@ -0,0 +1,192 @@
+import base64
+import zlib
+from bisect import bisect_left, bisect_right
+
+import cv2
+import numpy as np
+
+from . import store
+from .processing import VideoError
+from .progress import DEFAULT_INTERVAL, ProgressTracker
+
+INDEX_VERSION = 2
+# OpenCV's FFmpeg backend seeks this many frames before the target and
+# decodes forward from the keyframe it lands on
+SEEK_BACKOFF = 16
+# Frames a seek must save to beat grab(), for the seek itself
+SEEK_MIN_SAVING = 8
+
+
+class FrameIndex:
+    # Exact frame count, presentation timestamps (ms, as OpenCV reports them)
+    # and keyframe positions of a video's first stream. keyframes is None
+    # when the backend cannot report them.
+    def __init__(self, timestamps, keyframes=None):
+        self.timestamps = list(timestamps)
+        self.keyframes = sorted(keyframes) if keyframes is not None else None
+
+    @property
+    def frame_count(self):
+        return len(self.timestamps)
+
+    @property
+    def duration(self):
+        # Seconds, counting the last frame as long as the one before it
+        ts = self.timestamps
+        if len(ts) < 2:
+            return 0.0
+        return (ts[-1] - ts[0] + (ts[-1] - ts[-2])) / 1000
+
+    @property
+    def fps(self):
+        # Average rate, correct for variable frame rate files too
+        return self.frame_count / self.duration if self.duration else 0.0
+
+    def frame_at(self, ms):
+        # Index of the frame shown at `ms`, or None if none is within half a
+        # frame of it
+        ts = self.timestamps
+        i = bisect_left(ts, ms)
+        best = min((j for j in (i - 1, i) if 0 <= j < len(ts)), key=lambda j: abs(ts[j] - ms),
+                   default=None)
+        if best is None:
+            return None
+        gap = ts[best + 1] - ts[best] if best + 1 < len(ts) else ts[best] - ts[best - 1] if best else 0
+        return best if abs(ts[best] - ms) <= max(gap / 2, 1) else None
+
+    def keyframe_before(self, idx):
+        # The last keyframe at or before idx (0 when unknown)
+        if not self.keyframes:
+            return 0
+        i = bisect_right(self.keyframes, idx)
+        return self.keyframes[i - 1] if i else 0
+
+    def to_dict(self):
+        # Packed, since a project file stores it too: a feature film has
+        # hundreds of thousands of timestamps. They are kept to the
+        # microsecond, far below a frame.
+        return {'timestamps': _pack(np.round(np.asarray(self.timestamps) * 1000)),
+                'keyframes': None if self.keyframes is None else _pack(self.keyframes)}
+
+    @classmethod
+    def from_dict(cls, d):
+        keyframes = d.get('keyframes')
+        return cls((_unpack(d['timestamps']) / 1000).tolist(),
+                   None if keyframes is None else _unpack(keyframes).tolist())
+
+
+def _pack(values):
+    # Ascending integers as compressed differences
+    deltas = np.diff(np.asarray(values, dtype='<i8'), prepend=0)
+    return base64.b64encode(zlib.compress(deltas.astype('<i8').tobytes())).decode('ascii')
+
+
+def _unpack(text):
+    return np.cumsum(np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype='<i8'))
+
+
+def _packet_pass(path, cancel, tracker):
+    # Demuxes without decoding (OpenCV's raw stream mode, FFmpeg backend):
+    # every packet's pts and keyframe flag, in decode order
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1):
+            return None
+        packets = []
+        while not cancel() and cap.grab():
+            packets.append((cap.get(cv2.CAP_PROP_POS_MSEC),
+                            bool(cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME))))
+            tracker.set_done(len(packets))
+    finally:
+        cap.release()
+    packets.sort(key=lambda p: p[0])
+    times = [t for t, _ in packets]
+    if len(set(times)) != len(times):
+        return None  # missing or duplicate pts
+    return FrameIndex(times, [i for i, (_, key) in enumerate(packets) if key])
+
+
+def _decode_pass(path, cancel, tracker):
+    # Fallback for other backends: grab() every frame in order
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise VideoError(f'Could not open video file: {path}')
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        times = []
+        while not cancel() and cap.grab():
+            times.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+            tracker.set_done(len(times))
+    finally:
+        cap.release()
+    if any(b <= a for a, b in zip(times, times[1:])):
+        times = [i * 1000 / fps for i in range(len(times))]
+    return FrameIndex(times)
+
+
+def build_index(path, cancel=None, progress=None, progress_interval=DEFAULT_INTERVAL):
+    # Returns None when cancelled
+    cancel = cancel or (lambda: False)
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise VideoError(f'Could not open video file: {path}')
+    estimate = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    tracker = ProgressTracker(estimate, [progress], progress_interval)
+    index = _packet_pass(path, cancel, tracker)
+    if index is None and not cancel():
+        index = _decode_pass(path, cancel, tracker)
+    return None if cancel() else index
+
+
+def load_index(path, cancel=None, progress=None, progress_interval=DEFAULT_INTERVAL,
+               build=True):
+    # build_index(), cached on disk by file. build=False only looks in the
+    # cache and returns None on a miss.
+    cached = store.load('index', store.file_key(path, INDEX_VERSION))
+    if cached is not None:
+        return FrameIndex.from_dict(cached)
+    if not build:
+        return None
+    index = build_index(path, cancel, progress, progress_interval)
+    if index is not None:
+        remember_index(path, index)
+    return index
+
+
+def remember_index(path, index):
+    # Makes load_index(path) return index, e.g. one kept in a project file
+    store.save('index', store.file_key(path, INDEX_VERSION), index.to_dict())
+
+
+def seek(cap, index, idx):
+    # Positions cap so that the next read() returns frame idx: seeks to the
+    # keyframe before it, checks where the capture landed by its timestamp
+    # and grabs forward to the frame before idx. Falls back to OpenCV's own
+    # frame seek (an estimate on some files) without an index or when the
+    # landing frame cannot be identified. Returns True if the seek is exact.
+    if idx <= 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return True
+    if index is not None and index.keyframes and idx < index.frame_count:
+        cap.set(cv2.CAP_PROP_POS_MSEC, index.timestamps[index.keyframe_before(idx - 1)])
+        if cap.grab():
+            pos = index.frame_at(cap.get(cv2.CAP_PROP_POS_MSEC))
+            if pos is not None and pos < idx:
+                while pos < idx - 1 and cap.grab():
+                    pos += 1
+                if pos == idx - 1:
+                    return True
+    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+    return False
+
+
+def seek_saves(index, pos, idx):
+    # True if seek() reaches frame idx decoding fewer frames than grab()
+    # from pos, the frame the capture reads next (always, for idx < pos)
+    if idx <= pos:
+        return idx < pos
+    if index is None or not index.keyframes:
+        return False
+    landing = index.keyframe_before(max(index.keyframe_before(idx - 1) - SEEK_BACKOFF, 0))
+    return landing - pos >= SEEK_MIN_SAVING
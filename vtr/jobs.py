@@ -0,0 +1,186 @@
+import copy
+import itertools
+import threading
+from types import MappingProxyType
+
+from .autotune import resolve_algorithm
+from .processing import process_video
+from .resume import process_video_resumable
+from .segments import process_video_segmented
+from .smart import smart_render
+
+RENDERERS = {
+    'standard': process_video,
+    'smart': smart_render,
+    'segments': process_video_segmented,
+    'resumable': process_video_resumable,
+}
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class JobSpec:
+    # What a job processes, copied at submit time so later edits to the
+    # caller's masks or settings cannot reach a queued or running job
+    __slots__ = ('src', 'dst', 'masks', 'renderer', 'options')
+
+    def __init__(self, src, dst, masks, renderer='standard', **options):
+        if renderer not in RENDERERS:
+            raise ValueError(f'Unknown renderer: {renderer}')
+        object.__setattr__(self, 'src', src)
+        object.__setattr__(self, 'dst', dst)
+        object.__setattr__(self, 'masks', tuple(copy.deepcopy(list(masks))))
+        object.__setattr__(self, 'renderer', renderer)
+        object.__setattr__(self, 'options', MappingProxyType(dict(options)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('JobSpec is immutable')
+
+    def run(self, cancel=None, progress=None, options=None):
+        # options replaces self.options, e.g. with 'auto' resolved. A
+        # 'telemetry' option is closed when the run ends, so its summary
+        # covers the last attempt.
+        options = self.options if options is None else options
+        telemetry = options.get('telemetry')
+        try:
+            return RENDERERS[self.renderer](self.src, self.dst, list(self.masks), cancel=cancel,
+                                            progress=progress, **options)
+        finally:
+            if telemetry is not None:
+                telemetry.close()
+
+
+class Job:
+    def __init__(self, job_id, spec):
+        self.id = job_id
+        self.spec = spec
+        self.status = QUEUED
+        self.attempts = 0
+        self.progress = None   # last ProgressTracker snapshot
+        self.result = None     # ProcessResult once done
+        self.error = None
+        # choose_algorithm() report when the spec asked for algorithm='auto'
+        self.algorithm_report = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+
+class JobManager:
+    # Runs queued jobs in submission order, at most max_concurrent at a time,
+    # each on its own thread with its own cancel flag. listener(job, event)
+    # is called from job threads with event 'status', 'progress' or
+    # 'algorithm' (after an 'auto' algorithm choice).
+    def __init__(self, max_concurrent=1, listener=None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.listener = listener
+        self._jobs = {}
+        self._queue = []
+        self._running = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, job_id):
+        return self._jobs[job_id]
+
+    def submit(self, spec):
+        with self._lock:
+            job = Job(next(self._ids), spec)
+            self._jobs[job.id] = job
+            self._queue.append(job)
+        self._notify(job, 'status')
+        self._pump()
+        return job
+
+    def set_concurrency(self, max_concurrent):
+        with self._lock:
+            self.max_concurrent = max(1, max_concurrent)
+        self._pump()
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.finished:
+                return False
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                self._queue.remove(job)
+                job.status = CANCELLED
+            else:
+                return True
+        self._notify(job, 'status')
+        return True
+
+    def cancel_all(self):
+        for job in self.jobs():
+            self.cancel(job.id)
+
+    def retry(self, job_id):
+        # Requeue a failed or cancelled job with its original spec
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status not in (FAILED, CANCELLED):
+                return False
+            job.status = QUEUED
+            job.error = job.result = job.progress = None
+            job.cancel_event = threading.Event()
+            self._queue.append(job)
+        self._notify(job, 'status')
+        self._pump()
+        return True
+
+    def remove_finished(self):
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished]:
+                del self._jobs[job_id]
+
+    @property
+    def active(self):
+        with self._lock:
+            return self._running + len(self._queue)
+
+    def _pump(self):
+        started = []
+        with self._lock:
+            while self._queue and self._running < self.max_concurrent:
+                job = self._queue.pop(0)
+                job.status = RUNNING
+                job.attempts += 1
+                self._running += 1
+                started.append(job)
+        for job in started:
+            self._notify(job, 'status')
+            threading.Thread(target=self._run, args=(job,), name=f'job-{job.id}',
+                             daemon=True).start()
+
+    def _run(self, job):
+        def on_progress(snap):
+            job.progress = snap
+            self._notify(job, 'progress')
+
+        try:
+            options, job.algorithm_report = resolve_algorithm(job.spec.src, job.spec.masks,
+                                                              job.spec.options)
+            if job.algorithm_report:
+                self._notify(job, 'algorithm')
+            job.result = job.spec.run(cancel=job.cancel_event.is_set, progress=on_progress,
+                                      options=options)
+            status = CANCELLED if job.result.cancelled else DONE
+        except Exception as e:
+            job.error = str(e)
+            status = CANCELLED if job.cancel_event.is_set() else FAILED
+        with self._lock:
+            job.status = status
+            self._running -= 1
+        self._notify(job, 'status')
+        self._pump()
+
+    def _notify(self, job, event):
+        if self.listener:
+            self.listener(job, event)
@@ -0,0 +1,107 @@
+import os
+import sys
+import threading
+
+MIN_FRAMES = 2   # frames a pipeline needs to make progress with one worker
+
+
+def peak_rss_mb():
+    # Peak resident set size of this process and its finished children
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / 2 ** 20, 1)
+    scale = 1 if sys.platform == 'darwin' else 1024  # bytes on macOS, KiB elsewhere
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak * scale / 2 ** 20, 1)
+
+
+def _proc_rss(pid):
+    # Bytes resident, from /proc (Linux); OSError elsewhere
+    with open(f'/proc/{pid}/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _proc_tree_rss(pid):
+    total = _proc_rss(pid)
+    for tid in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{tid}/children') as f:
+                children = f.read().split()
+        except FileNotFoundError:
+            continue  # thread exited
+        for child in children:
+            try:
+                total += _proc_tree_rss(int(child))
+            except FileNotFoundError:
+                pass  # process exited
+    return total
+
+
+def rss_mb():
+    # Current resident set size of this process and its live children
+    # (process workers, segments), or None where it cannot be read
+    try:
+        return round(_proc_tree_rss(os.getpid()) / 2 ** 20, 1)
+    except (OSError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    proc = psutil.Process()
+    total = 0
+    for p in [proc] + proc.children(recursive=True):
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return round(total / 2 ** 20, 1)
+
+
+class FramePool:
+    # Decoded frames are recycled once written, and at most `count` exist at
+    # once: acquire() blocks while all of them are in flight. Buffers are
+    # adopted lazily, since the frame size is only known after decoding:
+    # while the pool is growing acquire() returns None, the caller decodes
+    # into a new array, and that array joins the pool on release().
+    def __init__(self, count, max_mb=None):
+        self.count = max(MIN_FRAMES, count)
+        self.max_mb = max_mb
+        self.allocated = 0
+        self._free = []
+        self._cond = threading.Condition()
+
+    def fit(self, frame_bytes):
+        # Lowers count so the frames stay within max_mb
+        if self.max_mb:
+            with self._cond:
+                self.count = max(MIN_FRAMES, min(self.count, int(self.max_mb * 2 ** 20) // frame_bytes))
+
+    def acquire(self, stop=None):
+        # A free frame array, or None if the caller should allocate one.
+        # Gives up waiting once `stop` is set.
+        with self._cond:
+            while not self._free and self.allocated >= self.count:
+                if stop is not None and stop.is_set():
+                    return None
+                self._cond.wait(0.1)
+            if self._free:
+                return self._free.pop()
+            self.allocated += 1
+            return None
+
+    def release(self, frame):
+        with self._cond:
+            if self.allocated > self.count:
+                # Shrinking after fit(): drop the array instead of keeping it
+                self.allocated -= 1
+            else:
+                self._free.append(frame)
+            self._cond.notify()
@@ -0,0 +1,231 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .memory import FramePool
+
+_DONE = object()
+
+# Per-process state for the 'process' backend, set up by _init_process
+_proc = {}
+
+
+def _init_process(engine, plans):
+    _proc['engine'] = engine
+    _proc['plans'] = plans
+    _proc['plan'] = _proc['scratch'] = None
+
+
+def _scratch_for(state, engine, plan, channels):
+    # Scratch buffers are kept until the plan changes, and carried over to a
+    # plan whose ROIs have the same sizes (a tracked or keyframed mask moving
+    # without changing shape), so moving masks do not allocate every frame
+    if state.get('plan') is not plan:
+        key = (plan.buffer_shapes, channels)
+        if state.get('key') != key:
+            state['key'], state['scratch'] = key, engine.new_scratch(plan, channels)
+        state['plan'] = plan
+    return state['scratch']
+
+
+def _inpaint_in_process(frame, idx):
+    # Also returns the frame's change to the worker's engine counters, which
+    # the parent adds to its own engine (see InpaintEngine.add_stats)
+    started = time.perf_counter()
+    engine = _proc['engine']
+    before = engine.stats()
+    plan = _proc['plans'].plan_for(idx)
+    frame = engine.apply(frame, plan, _scratch_for(_proc, engine, plan, frame.shape[2]))
+    stats = {k: v - before[k] for k, v in engine.stats().items()}
+    return frame, time.perf_counter() - started, stats
+
+
+def _passthrough(frame):
+    fut = Future()
+    fut.set_result((frame, 0.0, None))
+    return fut
+
+
+class FramePipeline:
+    # decoder thread -> pool of inpaint workers -> writer thread restoring order.
+    # Threads are the default since cv2 releases the GIL; 'process' avoids the
+    # GIL entirely at the cost of pickling every frame. `plans` is a MaskPlan
+    # or TimelinePlan; frames without an active mask skip the workers.
+    # Decoded frames come from a FramePool and are decoded into again once
+    # written; max_memory_mb caps the memory those frames take. An optional
+    # Telemetry gets a record per frame and profiles the pipeline threads.
+    BACKENDS = ('thread', 'process')
+
+    def __init__(self, engine, plans, workers=None, backend='thread', queue_size=None,
+                 max_memory_mb=None, telemetry=None):
+        if backend not in self.BACKENDS:
+            raise ValueError(f'Unknown pipeline backend: {backend}')
+        self.engine = engine
+        self.plans = plans
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.backend = backend
+        if engine.stateful:
+            # Keeps frames in order and the engine state in this process
+            self.workers, self.backend = 1, 'thread'
+        # Caps decoded frames waiting for a worker and frames in flight
+        self.queue_size = queue_size or 2 * self.workers
+        self.max_memory_mb = max_memory_mb
+        self.telemetry = telemetry
+        self.inpainted = self.passed_through = 0
+        self.frame_buffers = 0
+        self._local = threading.local()
+
+    def _inpaint_in_thread(self, frame, plan, record=None):
+        # Workers return (frame, seconds spent, counters of process workers)
+        started = time.perf_counter()
+        scratch = _scratch_for(self._local.__dict__, self.engine, plan, frame.shape[2])
+        frame = self.engine.apply(frame, plan, scratch, record)
+        return frame, time.perf_counter() - started, None
+
+    def _observe(self, frame):
+        started = time.perf_counter()
+        frame = self.engine.observe(frame)
+        return frame, time.perf_counter() - started, None
+
+    def _executor(self):
+        if self.backend == 'process':
+            return ProcessPoolExecutor(self.workers, initializer=_init_process,
+                                       initargs=(self.engine, self.plans))
+        return ThreadPoolExecutor(self.workers, thread_name_prefix='inpaint')
+
+    def run(self, cap, writer, total, cancel=None, tracker=None, start=0):
+        # Reads `total` frames (None: until cap.read() fails) whose first
+        # index is `start`; returns the number of frames written. Frame
+        # counts and stage times go to the optional ProgressTracker.
+        cancel = cancel or (lambda: False)
+        clock = time.perf_counter
+        add_time = tracker.add_time if tracker else lambda stage, seconds: None
+        telemetry = self.telemetry
+        profiled = telemetry.profiled if telemetry else lambda fn: fn
+        decoded = queue.Queue(self.queue_size)
+        pending = queue.Queue(self.queue_size)
+        # Enough frames for both queues, the workers, the decoder and the writer
+        frames = FramePool(2 * self.queue_size + self.workers + 2, self.max_memory_mb)
+        errors = []
+        stop = threading.Event()
+        written = 0
+
+        def put(q, item):
+            # Blocks until there is room, unless another stage failed
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def decode():
+            try:
+                indices = itertools.count(start) if total is None else range(start, start + total)
+                for idx in indices:
+                    if cancel():
+                        break
+                    buf = frames.acquire(stop)
+                    t = clock()
+                    ret, frame = cap.read() if buf is None else cap.read(buf)
+                    seconds = clock() - t
+                    add_time('decode', seconds)
+                    if not ret:
+                        break
+                    if idx == start:
+                        frames.fit(frame.nbytes)
+                    record = {'frame': idx, 'decode': seconds} if telemetry else None
+                    if not put(decoded, (idx, frame, record)):
+                        break
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                put(decoded, _DONE)
+
+        def write():
+            nonlocal written
+            try:
+                while True:
+                    item = pending.get()
+                    if item is _DONE:
+                        break
+                    fut, decoded_frame, record = item
+                    frame, seconds, stats = fut.result()
+                    add_time('inpaint', seconds)
+                    if stats:
+                        self.engine.add_stats(stats)
+                    t = clock()
+                    writer.write(frame)
+                    encode = clock() - t
+                    add_time('encode', encode)
+                    if record is not None:
+                        if seconds:  # not passed through
+                            record['inpaint'] = seconds
+                        if stats and 'cache_hits' in stats:
+                            record['cache_hits'] = stats['cache_hits']
+                        record['encode'] = encode
+                        telemetry.frame(record)
+                    frames.release(decoded_frame)
+                    written += 1
+                    if tracker:
+                        tracker.frame_done()
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+                # Keep draining so the dispatcher never blocks on a full queue
+                while pending.get() is not _DONE:
+                    pass
+
+        decoder = threading.Thread(target=profiled(decode), name='decode', daemon=True)
+        writer_thread = threading.Thread(target=profiled(write), name='encode', daemon=True)
+        inpaint_in_thread = profiled(self._inpaint_in_thread)
+        decoder.start()
+        writer_thread.start()
+
+        with self._executor() as pool:
+            while True:
+                try:
+                    item = decoded.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        break
+                    continue
+                if item is _DONE:
+                    break
+                idx, frame, record = item
+                t = clock()
+                plan = self.plans.plan_for(idx)
+                seconds = clock() - t
+                add_time('mask', seconds)
+                if record is not None:
+                    record['mask'] = seconds
+                    record['masked_px'] = plan.masked_pixels if plan else 0
+                    record['rois'] = len(plan.rois) if plan else 0
+                if plan is None:
+                    if self.engine.stateful:
+                        fut = pool.submit(self._observe, frame)
+                    else:
+                        fut = _passthrough(frame)
+                    self.passed_through += 1
+                elif self.backend == 'process':
+                    fut = pool.submit(_inpaint_in_process, frame, idx)
+                    self.inpainted += 1
+                else:
+                    fut = pool.submit(inpaint_in_thread, frame, plan, record)
+                    self.inpainted += 1
+                if not put(pending, (fut, frame, record)):
+                    break
+            pending.put(_DONE)
+            writer_thread.join()
+            stop.set()
+            decoder.join()
+
+        self.frame_buffers = frames.allocated
+        if errors:
+            raise errors[0]
+        return written
@@ -0,0 +1,116 @@
+import numpy as np
+
+
+def normalize_rect(rect):
+    x1, y1, x2, y2 = rect
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def canvas_to_video(rect, canvas_size, video_size):
+    # The preview is scaled to fit and centered on the canvas, so undo the
+    # letterbox offset and scale, then clamp to integer video pixels
+    cw, ch = canvas_size
+    w, h = video_size
+    scale = min(cw / w, ch / h)
+    ox = cw // 2 - int(w * scale) // 2
+    oy = ch // 2 - int(h * scale) // 2
+    x1, y1, x2, y2 = normalize_rect(rect)
+    return (min(max(int((x1 - ox) / scale), 0), w), min(max(int((y1 - oy) / scale), 0), h),
+            min(max(int((x2 - ox) / scale), 0), w), min(max(int((y2 - oy) / scale), 0), h))
+
+
+def video_to_canvas(rect, canvas_size, video_size):
+    # Inverse of canvas_to_video, for showing video-pixel masks on the preview
+    cw, ch = canvas_size
+    w, h = video_size
+    scale = min(cw / w, ch / h)
+    ox = cw // 2 - int(w * scale) // 2
+    oy = ch // 2 - int(h * scale) // 2
+    x1, y1, x2, y2 = normalize_rect(rect)
+    return (int(x1 * scale + ox), int(y1 * scale + oy), int(x2 * scale + ox), int(y2 * scale + oy))
+
+
+def merge_boxes(boxes):
+    # Repeatedly merge overlapping boxes until the set is stable
+    boxes = [list(b) for b in boxes]
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for b in boxes:
+            for o in out:
+                if b[0] < o[2] and o[0] < b[2] and b[1] < o[3] and o[1] < b[3]:
+                    o[0], o[1] = min(o[0], b[0]), min(o[1], b[1])
+                    o[2], o[3] = max(o[2], b[2]), max(o[3], b[3])
+                    merged = True
+                    break
+            else:
+                out.append(b)
+        boxes = out
+    return [tuple(b) for b in boxes]
+
+
+class MaskPlan:
+    # Everything the per-frame loop needs, built once per job: the clamped
+    # video-pixel rectangles and the padded ROIs with their mask crops
+    def __init__(self, rects, frame_size, pad):
+        w, h = frame_size
+        clamped = []
+        for rect in rects:
+            x1, y1, x2, y2 = normalize_rect(rect)
+            x1, x2 = min(max(int(x1), 0), w), min(max(int(x2), 0), w)
+            y1, y2 = min(max(int(y1), 0), h), min(max(int(y2), 0), h)
+            if x2 > x1 and y2 > y1:
+                clamped.append((x1, y1, x2, y2))
+
+        self.frame_size = (w, h)
+        self.pad = pad
+        self.rects = tuple(clamped)
+        self._mask = None
+
+        boxes = merge_boxes([(max(x1-pad, 0), max(y1-pad, 0), min(x2+pad, w), min(y2+pad, h))
+                             for x1, y1, x2, y2 in self.rects])
+        self.rois = []
+        for bx1, by1, bx2, by2 in boxes:
+            crop = np.zeros((by2-by1, bx2-bx1), dtype=np.uint8)
+            for x1, y1, x2, y2 in self.rects:
+                crop[max(y1-by1, 0):max(y2-by1, 0), max(x1-bx1, 0):max(x2-bx1, 0)] = 255
+            self.rois.append((slice(by1, by2), slice(bx1, bx2), crop))
+        # Identify each ROI's position and mask for the inpaint cache
+        self.roi_keys = [hash((sy.start, sy.stop, sx.start, sx.stop, m.tobytes()))
+                         for sy, sx, m in self.rois]
+        # Pixels inpainted per frame; ROIs never overlap, so none is counted twice
+        self.masked_pixels = sum(int(np.count_nonzero(m)) for _, _, m in self.rois)
+
+    @classmethod
+    def from_canvas(cls, rects, canvas_size, frame_size, pad):
+        return cls([canvas_to_video(r, canvas_size, frame_size) for r in rects], frame_size, pad)
+
+    @property
+    def mask(self):
+        # Full-frame mask, only built when the reference mode asks for it
+        if self._mask is None:
+            w, h = self.frame_size
+            self._mask = np.zeros((h, w), dtype=np.uint8)
+            for x1, y1, x2, y2 in self.rects:
+                self._mask[y1:y2, x1:x2] = 255
+        return self._mask
+
+    def __bool__(self):
+        return bool(self.rects)
+
+    def plan_for(self, idx):
+        # A static plan applies to every frame
+        return self if self.rects else None
+
+    @property
+    def buffer_shapes(self):
+        # Plans with equal buffer_shapes can share scratch buffers
+        return self.frame_size, tuple(m.shape for _, _, m in self.rois)
+
+    def new_scratch(self, channels=3, full=True):
+        # Per-worker output buffers, one per ROI plus one full frame (None
+        # unless full, since only the full-frame mode writes to it)
+        w, h = self.frame_size
+        rois = [np.empty(m.shape + (channels,), dtype=np.uint8) for _, _, m in self.rois]
+        return rois, np.empty((h, w, channels), dtype=np.uint8) if full else None
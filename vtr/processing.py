@@ -0,0 +1,120 @@
+import cv2
+
+from .algorithms import DEFAULT_ALGORITHM
+from .cache import DEFAULT_CACHE_SIZE, InpaintCache
+from .engine import INPAINT_RADIUS, InpaintEngine
+from .pipeline import FramePipeline
+from .pyramid import DEFAULT_SCALE
+from .progress import DEFAULT_INTERVAL, ProgressTracker
+
+DEFAULT_CODEC = 'mp4v'
+# Keyword arguments of make_engine(), as passed through **engine_options
+ENGINE_OPTIONS = ('mode', 'radius', 'cache_size', 'cache_tolerance', 'pyramid_scale',
+                  'pyramid_band', 'algorithm')
+
+
+class VideoError(Exception):
+    pass
+
+
+class VideoInfo:
+    def __init__(self, width, height, fps, frame_count):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_count = frame_count
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+
+def open_video(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise VideoError(f'Could not open video file: {path}')
+    info = VideoInfo(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                     int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                     cap.get(cv2.CAP_PROP_FPS),
+                     int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    return cap, info
+
+
+def open_writer(path, codec, fps, size):
+    if len(codec) != 4:
+        raise VideoError(f'Codec must be a four character code, got {codec!r}')
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+    if not out.isOpened():
+        raise VideoError(f'Could not open {path} for writing with codec {codec}')
+    return out
+
+
+class ProcessResult:
+    def __init__(self, frames, total, cancelled, passed_through=0, stats=None, timing=None):
+        self.frames = frames
+        self.total = total
+        self.cancelled = cancelled
+        # Frames with no active mask, written without inpainting
+        self.passed_through = passed_through
+        # Engine counters such as cache hits and misses
+        self.stats = stats or {}
+        # Final ProgressTracker snapshot: fps, elapsed and per-stage seconds
+        self.timing = timing or {}
+        # Sampled while the job ran (see ProgressTracker), children included
+        self.peak_rss_mb = self.timing.get('peak_rss_mb')
+
+
+def make_engine(mode='roi', radius=INPAINT_RADIUS, cache_size=DEFAULT_CACHE_SIZE,
+                cache_tolerance=0.0, pyramid_scale=DEFAULT_SCALE, pyramid_band=None,
+                algorithm=DEFAULT_ALGORITHM):
+    # The engine options shared by every processing entry point
+    cache = InpaintCache(cache_size, cache_tolerance) if cache_size else None
+    return InpaintEngine(radius=radius, algorithm=algorithm, mode=mode, cache=cache,
+                         pyramid_scale=pyramid_scale, pyramid_band=pyramid_band)
+
+
+def merge_stats(stats_list):
+    merged = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def process_video(src, dst, masks, codec=DEFAULT_CODEC, workers=None, backend='thread',
+                  cancel=None, progress=None, progress_interval=DEFAULT_INTERVAL,
+                  max_memory_mb=None, telemetry=None, **engine_options):
+    # masks are (x1, y1, x2, y2) rects in video pixels, active on every frame,
+    # or timeline Mask objects. cancel() is polled between frames and
+    # progress(snapshot) receives ProgressTracker snapshots from the writer
+    # thread. max_memory_mb caps the decoded frames in flight (see
+    # FramePipeline). telemetry is an optional vtr.telemetry.Telemetry;
+    # the caller closes it. engine_options go to make_engine().
+    from .index import load_index  # vtr.index imports this module
+
+    cancel = cancel or (lambda: False)
+    cap, info = open_video(src)
+    try:
+        engine = make_engine(**engine_options)
+        plans = engine.compile_timeline(masks, info.size)
+        out = open_writer(dst, codec, info.fps, info.size)
+        try:
+            # CAP_PROP_FRAME_COUNT is an estimate, only good for the progress
+            # bar: the frame index counts exactly when one is cached, and
+            # otherwise the pipeline reads to the end of the file
+            index = load_index(src, build=False)
+            total = index.frame_count if index else None
+            tracker = ProgressTracker(total or info.frame_count, [progress], progress_interval)
+            pipeline = FramePipeline(engine, plans, workers=workers, backend=backend,
+                                     max_memory_mb=max_memory_mb, telemetry=telemetry)
+            frames = pipeline.run(cap, out, total, cancel=cancel, tracker=tracker)
+        finally:
+            out.release()
+    finally:
+        cap.release()
+    cancelled = cancel()
+    if total is None and not cancelled:
+        total = tracker.total = frames
+        tracker.publish()
+    return ProcessResult(frames, total, cancelled, pipeline.passed_through,
+                         engine.stats(), tracker.snapshot())
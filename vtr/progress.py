@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+
+from .memory import rss_mb
+
+DEFAULT_INTERVAL = 0.25
+STAGES = ('decode', 'mask', 'inpaint', 'encode')
+
+
+class ProgressTracker:
+    # Collects frame counts and per-stage time from the processing threads
+    # and publishes snapshots to listeners at most every `interval` seconds
+    # (and always on the final frame). Listeners run on the publishing
+    # thread, so GUIs should hand snapshots over through a queue. A total of
+    # 0 means unknown, e.g. for streamed input. Every snapshot samples the
+    # memory in use, so peak_rss_mb is the peak seen during this job.
+    def __init__(self, total, listeners=(), interval=DEFAULT_INTERVAL):
+        self.total = total
+        self.listeners = [l for l in listeners if l]
+        self.interval = interval
+        self.done = 0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.started = time.monotonic()
+        self._last = 0.0
+        self._lock = threading.Lock()
+        self.peak_rss_mb = None
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def frame_done(self, n=1):
+        with self._lock:
+            self.done += n
+        self._maybe_publish()
+
+    def set_done(self, done):
+        with self._lock:
+            self.done = done
+        self._maybe_publish()
+
+    def _maybe_publish(self):
+        now = time.monotonic()
+        if now - self._last < self.interval and (not self.total or self.done != self.total):
+            return
+        self._last = now
+        self.publish()
+
+    def snapshot(self):
+        rss = rss_mb()
+        with self._lock:
+            done, stages = self.done, dict(self.stages)
+            if rss is not None and (self.peak_rss_mb is None or rss > self.peak_rss_mb):
+                self.peak_rss_mb = rss
+            peak = self.peak_rss_mb
+        elapsed = time.monotonic() - self.started
+        fps = done / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - done, 0) if self.total else None
+        return {
+            'done': done,
+            'total': self.total,
+            'percent': done / self.total * 100 if self.total else 0.0,
+            'elapsed': elapsed,
+            'fps': fps,
+            'eta': remaining / fps if fps and remaining is not None else None,
+            'stages': stages,
+            'peak_rss_mb': peak,
+        }
+
+    def publish(self):
+        snap = self.snapshot()
+        for listener in self.listeners:
+            listener(snap)
+
+
+def format_stages(snap):
+    # Milliseconds per frame spent in each stage, summed over workers
+    done = snap['done'] or 1
+    return ' | '.join(f'{name} {secs / done * 1000:.1f} ms'
+                      for name, secs in snap['stages'].items() if secs)
+
+
+def format_progress(snap):
+    eta = snap['eta']
+    eta = f'{int(eta // 60)}:{int(eta % 60):02d}' if eta is not None else '--:--'
+    return f"{int(snap['percent'])}% | {snap['fps']:.1f} fps | ETA {eta}"
+
+
+def logging_listener(logger=None, level=logging.INFO):
+    # A listener that writes snapshots to a logging.Logger
+    logger = logger or logging.getLogger('vtr')
+
+    def listen(snap):
+        logger.log(level, '%s/%s frames, %s, %s', snap['done'], snap['total'],
+                   format_progress(snap), format_stages(snap))
+    return listen
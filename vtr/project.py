@@ -0,0 +1,137 @@
+import json
+import os
+
+from .index import INDEX_VERSION, FrameIndex, load_index, remember_index
+from .processing import VideoInfo, open_video
+from .resume import source_fingerprint
+from .timeline import Mask, MaskTimeline
+
+PROJECT_VERSION = 1
+PROJECT_EXT = '.vtrproj'
+# Keys of Project.settings: engine options plus how the job is run
+SETTINGS = ('mode', 'algorithm', 'radius', 'cache_size', 'cache_tolerance', 'pyramid_scale',
+            'pyramid_band', 'workers', 'backend', 'max_memory_mb', 'renderer', 'codec')
+
+
+class ProjectError(Exception):
+    pass
+
+
+def scale_mask(mask, sx, sy):
+    # The same mask on a video scaled by (sx, sy), e.g. an SD episode of a
+    # series whose project was made on the HD master
+    def scale(r):
+        return (round(r[0] * sx), round(r[1] * sy), round(r[2] * sx), round(r[3] * sy))
+    return Mask(scale(mask.rect), mask.start, mask.end,
+                [(f, scale(r)) for f, r in mask.keyframes])
+
+
+class Project:
+    # Masks in video pixels with their time ranges, the job settings, and the
+    # source video they were drawn on, identified by its fingerprint.
+    # `derived` caches data computed from the source (probe info, the frame
+    # index, detection results, the mask plan); each entry is dropped when the
+    # source changes.
+    def __init__(self, source=None, masks=(), settings=None, fingerprint=None, derived=None):
+        self.source = source
+        self.masks = [m if isinstance(m, Mask) else Mask(m) for m in masks]
+        self.settings = {k: v for k, v in (settings or {}).items() if k in SETTINGS}
+        self.fingerprint = fingerprint
+        self.derived = derived or {}
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ProjectError(f'Could not read project {path}: {e}')
+        if not isinstance(data, dict) or data.get('version') != PROJECT_VERSION:
+            raise ProjectError(f'{path} is not a version {PROJECT_VERSION} project file')
+        source = data.get('source')
+        if source and not os.path.isabs(source):
+            # Stored relative to the project, so project and video can move together
+            source = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(path)), source))
+        return cls(source, [Mask.from_dict(d) for d in data.get('masks', [])],
+                   data.get('settings'), data.get('fingerprint'), data.get('derived'))
+
+    def save(self, path):
+        source = self.source
+        if source:
+            try:
+                source = os.path.relpath(source, os.path.dirname(os.path.abspath(path)))
+            except ValueError:
+                source = os.path.abspath(source)  # another drive on Windows
+        data = {'version': PROJECT_VERSION, 'source': source, 'fingerprint': self.fingerprint,
+                'masks': [m.to_dict() for m in self.masks], 'settings': self.settings,
+                'derived': self.derived}
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
+
+    def probe(self):
+        # VideoInfo of the source. While the file is unchanged it comes from
+        # the project without opening the video; otherwise the video is
+        # probed again and the derived data is dropped.
+        fp = self.fingerprint
+        try:
+            st = os.stat(self.source)
+        except (OSError, TypeError):
+            raise ProjectError(f'Project source not found: {self.source}')
+        if fp and fp.get('size') == st.st_size and fp.get('mtime') == int(st.st_mtime):
+            return VideoInfo(fp['width'], fp['height'], fp['fps'], fp['frames'])
+        cap, info = open_video(self.source)
+        cap.release()
+        self.fingerprint = source_fingerprint(self.source, info)
+        self.derived = {}
+        return info
+
+    def cached(self, kind, key):
+        # Derived data stored by store() with an equal key, or None
+        entry = self.derived.get(kind)
+        if entry and entry.get('key') == key:
+            return entry['data']
+        return None
+
+    def store(self, kind, key, data):
+        self.derived[kind] = {'key': key, 'data': data}
+
+    def frame_index(self, cancel=None, build=True):
+        # The source's FrameIndex, kept in the project so the video is not
+        # indexed again on another machine. A kept index is also handed to
+        # this machine's disk store, where every load_index() caller
+        # (navigator, tracking, detection, segments, resume) finds it.
+        # build=False returns None instead of indexing.
+        self.probe()
+        key = {'version': INDEX_VERSION, 'source': self.fingerprint}
+        data = self.cached('index', key)
+        if data is not None:
+            index = FrameIndex.from_dict(data)
+            remember_index(self.source, index)
+            return index
+        if not build:
+            return None
+        index = load_index(self.source, cancel)
+        if index is not None:
+            self.store('index', key, index.to_dict())
+        return index
+
+    def plan_summary(self, total):
+        # Active mask sets per frame span, cached until the masks change
+        timeline = MaskTimeline(self.masks)
+        key = timeline.fingerprint()
+        summary = self.cached('plan', key)
+        if summary is None:
+            spans = [[s, e, list(active)] for s, e, active in timeline.spans(total)]
+            summary = {'spans': spans, 'masked_frames': timeline.masked_frames(total)}
+            self.store('plan', key, summary)
+        return summary
+
+    def masks_for(self, size):
+        # The masks for a video of `size`, scaled when it differs from the source
+        fp = self.fingerprint
+        if not fp or (fp['width'], fp['height']) == tuple(size):
+            return list(self.masks)
+        sx, sy = size[0] / fp['width'], size[1] / fp['height']
+        return [scale_mask(m, sx, sy) for m in self.masks]
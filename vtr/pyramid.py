@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+DEFAULT_SCALE = 0.5
+
+
+class PyramidInpaint:
+    # Inpaints a downscaled copy of each ROI, upsamples the fill into the
+    # mask, then re-inpaints only a band of `band` pixels along the mask
+    # border at full resolution, where seams would show. Cost drops roughly
+    # with scale**2 for large masks. scale=1 is plain full-resolution inpaint.
+    def __init__(self, radius, inpaint, scale=DEFAULT_SCALE, band=None, cache_size=64):
+        # inpaint is a vtr.algorithms function
+        if not 0 < scale <= 1:
+            raise ValueError(f'Pyramid scale must be in (0, 1], got {scale}')
+        self.radius = radius
+        self.inpaint_fn = inpaint
+        self.scale = scale
+        self.band = band if band is not None else 2 * radius
+        # Downscaled and border-band masks per ROI key, like TimelinePlan's LRU
+        self._masks = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_masks'] = OrderedDict()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _derived(self, key, mask):
+        with self._lock:
+            entry = self._masks.get(key)
+            if entry is not None:
+                self._masks.move_to_end(key)
+                return entry
+        h, w = mask.shape
+        sw, sh = max(1, round(w * self.scale)), max(1, round(h * self.scale))
+        # INTER_AREA keeps any partially covered pixel masked
+        small = (cv2.resize(mask, (sw, sh), interpolation=cv2.INTER_AREA) > 0).astype(np.uint8) * 255
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * self.band + 1, 2 * self.band + 1))
+        band = cv2.subtract(mask, cv2.erode(mask, kernel))
+        # Thin masks are mostly border; the plain path is cheaper for them
+        plain = cv2.countNonZero(band) * 2 >= cv2.countNonZero(mask)
+        entry = (small, band, plain)
+        with self._lock:
+            self._masks[key] = entry
+            if len(self._masks) > self._cache_size:
+                self._masks.popitem(last=False)
+        return entry
+
+    def inpaint(self, crop, mask, dst, key=None):
+        inpaint = self.inpaint_fn
+        if self.scale == 1:
+            return inpaint(crop, mask, self.radius, dst)
+        small_mask, band, plain = self._derived(key if key is not None else mask.tobytes(), mask)
+        if plain:
+            return inpaint(crop, mask, self.radius, dst)
+        h, w = mask.shape
+        small = cv2.resize(crop, small_mask.shape[::-1], interpolation=cv2.INTER_AREA)
+        small = inpaint(small, small_mask, max(1, round(self.radius * self.scale)))
+        up = cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+        filled = crop.copy()
+        cv2.copyTo(up, mask, filled)
+        return inpaint(filled, band, self.radius, dst)
@@ -0,0 +1,121 @@
+import time
+
+import cv2
+import numpy as np
+
+from .index import load_index, seek
+from .processing import VideoError, make_engine, open_video
+from .timeline import MaskTimeline
+
+DEFAULT_SAMPLES = 8
+
+
+def psnr(a, b, mask=None):
+    # Over the pixels where mask is nonzero, when given
+    if mask is not None:
+        a, b = a[mask > 0], b[mask > 0]
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def ssim(a, b, mask=None):
+    # Mean SSIM of the grayscale images with the usual 11x11, sigma 1.5
+    # window, averaged over the pixels where mask is nonzero when given (the
+    # windows still see the surrounding pixels)
+    if a.ndim == 3:
+        a, b = cv2.cvtColor(a, cv2.COLOR_BGR2GRAY), cv2.cvtColor(b, cv2.COLOR_BGR2GRAY)
+    a, b = a.astype(np.float64), b.astype(np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a ** 2
+    var_b = blur(b * b) - mu_b ** 2
+    cov = blur(a * b) - mu_a * mu_b
+    s = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(s[mask > 0].mean() if mask is not None else s.mean())
+
+
+def roi_scores(a, b, rois, with_ssim=False):
+    # (psnr, ssim or None) of each plan ROI of two outputs of the same frame,
+    # scored on the masked pixels only: the padding around a mask is the
+    # decoded frame on both sides and would only inflate the scores. PSNR is
+    # capped at 100 dB so identical ROIs can be averaged.
+    return [(min(psnr(a[sy, sx], b[sy, sx], mask), 100.0),
+             ssim(a[sy, sx], b[sy, sx], mask) if with_ssim else None)
+            for sy, sx, mask in rois]
+
+
+def sample_frames(path, masks, samples=DEFAULT_SAMPLES):
+    # Up to `samples` decoded (index, frame) pairs spread over the frames
+    # where some mask is active
+    timeline = masks if isinstance(masks, MaskTimeline) else MaskTimeline(masks)
+    cap, info = open_video(path)
+    try:
+        index = load_index(path)
+        total = index.frame_count if index else info.frame_count
+        spans = [(s, e) for s, e, active in timeline.spans(total) if active]
+        masked = sum(e - s for s, e in spans)
+        if not masked:
+            raise VideoError(f'No masked frames to sample in {path}')
+        wanted = sorted({masked * (2 * i + 1) // (2 * samples) for i in range(samples)})
+        indexes = []
+        for offset in wanted:
+            for s, e in spans:
+                if offset < e - s:
+                    indexes.append(s + offset)
+                    break
+                offset -= e - s
+        frames = []
+        for idx in indexes:
+            seek(cap, index, idx)
+            ret, frame = cap.read()
+            if ret:
+                frames.append((idx, frame))
+        return timeline, info, frames
+    finally:
+        cap.release()
+
+
+def _run(engine, plans, frames):
+    out = []
+    started = time.perf_counter()
+    for idx, frame in frames:
+        out.append(engine.apply(frame.copy(), plans.plan_for(idx)))
+    return out, time.perf_counter() - started
+
+
+def compare_engines(frames, timeline, frame_size, reference=None, **candidate):
+    # Inpaints sampled (index, frame) pairs with the reference options
+    # (default: full-resolution 'roi') and the candidate options, and scores
+    # the candidate's masked pixels against the reference (see roi_scores).
+    # Caches are off so both sides do the full work on every frame.
+    reference = dict(reference or {'mode': 'roi'}, cache_size=0)
+    candidate = dict(candidate, cache_size=0)
+    ref_engine, cand_engine = make_engine(**reference), make_engine(**candidate)
+    ref_plans = ref_engine.compile_timeline(timeline, frame_size)
+    cand_plans = cand_engine.compile_timeline(timeline, frame_size)
+    # Frames whose masks all lie outside the picture have nothing to score
+    frames = [(idx, frame) for idx, frame in frames if ref_plans.plan_for(idx) is not None]
+    if not frames:
+        raise VideoError('no masked pixels in the sampled frames')
+    ref_out, ref_secs = _run(ref_engine, ref_plans, frames)
+    cand_out, cand_secs = _run(cand_engine, cand_plans, frames)
+
+    scores = [score for (idx, _), a, b in zip(frames, ref_out, cand_out)
+              for score in roi_scores(a, b, ref_plans.plan_for(idx).rois, with_ssim=True)]
+    psnrs, ssims = [p for p, _ in scores], [s for _, s in scores]
+    n = len(frames) or 1
+    return {
+        'frames': len(frames),
+        'psnr': round(float(np.mean(psnrs)), 2) if psnrs else None,
+        'ssim': round(float(np.mean(ssims)), 4) if ssims else None,
+        'reference_ms': round(ref_secs / n * 1000, 2),
+        'candidate_ms': round(cand_secs / n * 1000, 2),
+        'speedup': round(ref_secs / cand_secs, 2) if cand_secs else None,
+    }
+
+
+def check_quality(path, masks, samples=DEFAULT_SAMPLES, reference=None, **candidate):
+    # compare_engines() on frames sampled from a clip
+    timeline, info, frames = sample_frames(path, masks, samples)
+    return compare_engines(frames, timeline, info.size, reference, **candidate)
@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+
+from . import ffmpeg
+from .index import load_index, seek
+from .pipeline import FramePipeline
+from .processing import (DEFAULT_CODEC, ProcessResult, VideoError, make_engine, open_video,
+                         open_writer)
+from .progress import DEFAULT_INTERVAL, ProgressTracker
+from .segments import verify_output
+from .timeline import MaskTimeline
+
+DEFAULT_SEGMENT_FRAMES = 1500
+MANIFEST_VERSION = 1
+
+
+def manifest_path(dst):
+    return dst + '.resume.json'
+
+
+def parts_dir(dst):
+    return dst + '.parts'
+
+
+def source_fingerprint(path, info):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime': int(st.st_mtime), 'frames': info.frame_count,
+            'width': info.width, 'height': info.height, 'fps': info.fps}
+
+
+def load_manifest(dst):
+    try:
+        with open(manifest_path(dst)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def save_manifest(dst, manifest):
+    # Written to a temporary file and renamed, so a crash leaves either the
+    # previous manifest or the new one
+    path = manifest_path(dst)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+
+def process_video_resumable(src, dst, masks, segment_frames=DEFAULT_SEGMENT_FRAMES,
+                            codec=DEFAULT_CODEC, workers=None, backend='thread', cancel=None,
+                            progress=None, progress_interval=DEFAULT_INTERVAL, verify=True,
+                            max_memory_mb=None, telemetry=None, **engine_options):
+    # Writes dst in parts of segment_frames frames under dst + '.parts' and
+    # records each finished part in dst + '.resume.json'. Running again with
+    # the same source, masks and options skips the recorded parts; anything
+    # else starts over. Parts are joined with ffmpeg once all are done. The
+    # temporal model restarts empty at the resume point.
+    cancel = cancel or (lambda: False)
+    ffmpeg.require_ffmpeg('Resumable processing')
+    cap, info = open_video(src)
+    try:
+        timeline = masks if isinstance(masks, MaskTimeline) else MaskTimeline(masks)
+        ext = os.path.splitext(dst)[1] or '.mp4'
+        key = {
+            'version': MANIFEST_VERSION,
+            'source': source_fingerprint(src, info),
+            'plan': timeline.fingerprint(),
+            'codec': codec,
+            'segment_frames': segment_frames,
+            # cache_size only changes speed, not output
+            'engine': {k: v for k, v in sorted(engine_options.items()) if k != 'cache_size'},
+        }
+        manifest = load_manifest(dst)
+        workdir = parts_dir(dst)
+        if not manifest or {k: manifest.get(k) for k in key} != key:
+            shutil.rmtree(workdir, ignore_errors=True)
+            manifest = dict(key, completed=[])
+        os.makedirs(workdir, exist_ok=True)
+        completed = {start: (end, name) for start, end, name in manifest['completed']
+                     if os.path.exists(os.path.join(workdir, name))}
+
+        engine = make_engine(**engine_options)
+        plans = engine.compile_timeline(timeline, info.size)
+        index = load_index(src, cancel)
+        if index is None:
+            return ProcessResult(0, info.frame_count, True)
+        total = index.frame_count
+        ranges = [(s, min(s + segment_frames, total)) for s in range(0, total, segment_frames)]
+        if not ranges:
+            raise VideoError(f'No frames to process in {src}')
+        tracker = ProgressTracker(total, [progress], progress_interval)
+        done = sum(end - start for start, (end, _) in completed.items())
+        tracker.set_done(done)
+        passed = 0
+        position = None
+        for i, (start, end) in enumerate(ranges):
+            if start in completed and completed[start][0] == end:
+                continue
+            if cancel():
+                break
+            if position != start:
+                seek(cap, index, start)
+            name = f'part{i:05d}{ext}'
+            tmp = os.path.join(workdir, 'writing' + ext)
+            out = open_writer(tmp, codec, info.fps, info.size)
+            try:
+                pipeline = FramePipeline(engine, plans, workers=workers, backend=backend,
+                                         max_memory_mb=max_memory_mb, telemetry=telemetry)
+                frames = pipeline.run(cap, out, end - start, cancel=cancel,
+                                      tracker=tracker, start=start)
+            finally:
+                out.release()
+            position = start + frames
+            if frames != end - start:
+                os.remove(tmp)
+                if cancel():
+                    break
+                raise VideoError(f'Frames {start}-{end} decoded {frames} of {end - start} frames')
+            os.replace(tmp, os.path.join(workdir, name))
+            completed[start] = (end, name)
+            manifest['completed'] = [[s, e, n] for s, (e, n) in sorted(completed.items())]
+            save_manifest(dst, manifest)
+            done += frames
+            passed += pipeline.passed_through
+    finally:
+        cap.release()
+
+    if len(completed) < len(ranges):
+        return ProcessResult(done, total, True, passed, engine.stats(), tracker.snapshot())
+    parts = [os.path.join(workdir, completed[start][1]) for start, _ in ranges]
+    if info.fps:
+        ffmpeg.concat(parts, dst, [(end - start) / info.fps for start, end in ranges])
+    else:
+        ffmpeg.concat(parts, dst)
+    if verify:
+        verify_output(src, dst, total, info.fps)
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.remove(manifest_path(dst))
+    return ProcessResult(total, total, False, passed, engine.stats(), tracker.snapshot())
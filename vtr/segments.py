@@ -0,0 +1,156 @@
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import ffmpeg
+from .index import load_index, seek
+from .pipeline import FramePipeline
+from .progress import DEFAULT_INTERVAL, ProgressTracker
+from .processing import (DEFAULT_CODEC, ProcessResult, VideoError, make_engine, merge_stats,
+                         open_video, open_writer)
+from .telemetry import Telemetry
+
+# Shared with the segment processes through the pool initializer
+_shared = {}
+
+
+def split_ranges(total, segments):
+    # Split [0, total) into up to `segments` contiguous (start, end) ranges
+    segments = max(1, min(segments, total))
+    bounds = [total * i // segments for i in range(segments + 1)]
+    return [(bounds[i], bounds[i+1]) for i in range(segments) if bounds[i+1] > bounds[i]]
+
+
+def _init_segment_worker(cancel_event, done_counts):
+    _shared['cancel'] = cancel_event
+    _shared['done'] = done_counts
+
+
+def _process_segment(idx, src, dst, start, end, engine, masks, codec, max_memory_mb=None,
+                     index=None, telemetry=False):
+    # Runs in its own process with its own capture, seek and writer. With
+    # telemetry, the per-frame records go back to the parent's Telemetry.
+    done = _shared['done']
+    cancel = _shared['cancel']
+    done[idx] = 0
+    cap, info = open_video(src)
+    try:
+        plans = engine.compile_timeline(masks, info.size)
+        seek(cap, index, start)
+        out = open_writer(dst, codec, info.fps, info.size)
+        try:
+            def on_progress(snap):
+                done[idx] = snap['done']
+            tracker = ProgressTracker(end - start, [on_progress], interval=0)
+            recorder = Telemetry(keep=True) if telemetry else None
+            pipeline = FramePipeline(engine, plans, workers=1, max_memory_mb=max_memory_mb,
+                                     telemetry=recorder)
+            frames = pipeline.run(cap, out, end - start, cancel=cancel.is_set,
+                                  tracker=tracker, start=start)
+        finally:
+            out.release()
+    finally:
+        cap.release()
+    if frames != end - start and not cancel.is_set():
+        raise VideoError(f'Segment {idx} wrote {frames} of {end - start} frames')
+    return pipeline.passed_through, engine.stats(), tracker.stages, \
+        recorder.records if recorder else None
+
+
+def verify_output(src, dst, expected_frames, fps):
+    # The joined file must match the source's frame count and timeline
+    frames, duration = ffmpeg.probe_frames(dst)
+    if frames != expected_frames:
+        raise VideoError(f'Output has {frames} frames, source has {expected_frames}')
+    if fps and duration and abs(duration - expected_frames / fps) > 1.5 / fps:
+        raise VideoError(f'Output lasts {duration:.3f}s, expected {expected_frames / fps:.3f}s')
+
+
+def process_video_segmented(src, dst, masks, segments=None, codec=DEFAULT_CODEC, retries=2,
+                            workers=None, backend='process', cancel=None, progress=None,
+                            progress_interval=DEFAULT_INTERVAL, verify=True, max_memory_mb=None,
+                            telemetry=None, **engine_options):
+    # Each frame range gets its own process; finished parts are stream-copied
+    # into dst. A failed segment is retried on its own, up to `retries` times.
+    # workers caps the segments processed at once (default: CPU count);
+    # backend is accepted like the other renderers' but segments always run
+    # in processes.
+    # max_memory_mb is shared out evenly between the concurrent segments.
+    # Segments are cut from the exact frame count of the video's FrameIndex
+    # and seek through its keyframes. A telemetry gets every segment's frame
+    # records as the segment finishes; the segment processes are not profiled.
+    cancel = cancel or (lambda: False)
+    ffmpeg.require_ffmpeg('Segmented processing')
+    cap, info = open_video(src)
+    cap.release()
+    index = load_index(src, cancel)
+    if index is None:
+        return ProcessResult(0, info.frame_count, True)
+    total = index.frame_count
+
+    workers = workers or os.cpu_count() or 1
+    ranges = split_ranges(total, segments or workers)
+    if not ranges:
+        raise VideoError(f'No frames to process in {src}')
+    ext = os.path.splitext(dst)[1] or '.mp4'
+    workdir = tempfile.mkdtemp(prefix='.segments-', dir=os.path.dirname(os.path.abspath(dst)))
+    parts = [os.path.join(workdir, f'part{i:05d}{ext}') for i in range(len(ranges))]
+    engine = make_engine(**engine_options)
+
+    ctx = mp.get_context()
+    concurrent = min(len(ranges), workers)
+    segment_mb = max_memory_mb / concurrent if max_memory_mb else None
+    cancel_event = ctx.Event()
+    done = ctx.Array('q', len(ranges), lock=False)
+    tracker = ProgressTracker(total, [progress], progress_interval)
+    attempts = [0] * len(ranges)
+    passed = [0] * len(ranges)
+    stats = [{}] * len(ranges)
+    remaining = list(range(len(ranges)))
+    try:
+        while remaining:
+            failed = []
+            # A fresh pool per round, since a crashed worker breaks the pool
+            with ProcessPoolExecutor(min(len(remaining), workers),
+                                     mp_context=ctx, initializer=_init_segment_worker,
+                                     initargs=(cancel_event, done)) as pool:
+                futures = {pool.submit(_process_segment, i, src, parts[i], *ranges[i],
+                                       engine, masks, codec, segment_mb, index,
+                                       telemetry is not None): i for i in remaining}
+                pending = set(futures)
+                while pending:
+                    finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    if cancel():
+                        cancel_event.set()
+                    tracker.set_done(sum(done))
+                    for fut in finished:
+                        idx = futures[fut]
+                        try:
+                            passed[idx], stats[idx], stages, records = fut.result()
+                            for stage, seconds in stages.items():
+                                tracker.add_time(stage, seconds)
+                            for record in records or ():
+                                telemetry.frame(record)
+                        except Exception as e:
+                            attempts[idx] += 1
+                            if attempts[idx] > retries:
+                                cancel_event.set()
+                                raise VideoError(f'Segment {idx} failed after {attempts[idx]} attempts: {e}')
+                            failed.append(idx)
+            if cancel_event.is_set():
+                return ProcessResult(sum(done), total, True, sum(passed),
+                                     merge_stats(stats), tracker.snapshot())
+            remaining = sorted(failed)
+
+        if info.fps:
+            ffmpeg.concat(parts, dst, [(e - s) / info.fps for s, e in ranges])
+        else:
+            ffmpeg.concat(parts, dst)
+        if verify:
+            verify_output(src, dst, sum(e - s for s, e in ranges), info.fps)
+        return ProcessResult(sum(done), total, False, sum(passed), merge_stats(stats),
+                             tracker.snapshot())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+
+from . import ffmpeg
+from .pipeline import FramePipeline
+from .progress import DEFAULT_INTERVAL, ProgressTracker
+from .processing import ProcessResult, VideoError, make_engine, open_video
+from .segments import verify_output
+from .timeline import MaskTimeline
+
+# Encoders used for re-encoded GOPs, keyed by the source codec. Parts are
+# written as MPEG-TS so each carries its own parameter sets when joined.
+ENCODERS = {
+    'h264': ['-c:v', 'libx264', '-crf', '16', '-preset', 'medium'],
+    'hevc': ['-c:v', 'libx265', '-crf', '18', '-preset', 'medium'],
+    'mpeg4': ['-c:v', 'mpeg4', '-q:v', '2'],
+    'mpeg2video': ['-c:v', 'mpeg2video', '-q:v', '2'],
+}
+PART_EXT, PART_FORMAT = '.ts', 'mpegts'
+
+
+def gop_ranges(keyflags):
+    # (start, end) frame ranges of each GOP from per-packet keyframe flags
+    starts = [i for i, key in enumerate(keyflags) if key]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return list(zip(starts, starts[1:] + [len(keyflags)]))
+
+
+def plan_runs(gops, timeline):
+    # Merge consecutive GOPs into (start, end, dirty) runs, where dirty runs
+    # contain at least one frame with an active mask
+    runs = []
+    for start, end in gops:
+        dirty = timeline.any_active(start, end)
+        if runs and runs[-1][2] == dirty:
+            runs[-1] = (runs[-1][0], end, dirty)
+        else:
+            runs.append((start, end, dirty))
+    return runs
+
+
+def smart_render(src, dst, masks, workers=None, backend='thread', cancel=None, progress=None,
+                 progress_interval=DEFAULT_INTERVAL, verify=True, max_memory_mb=None,
+                 telemetry=None, **engine_options):
+    # Re-encode only the GOPs that contain masked frames and stream-copy the
+    # rest. Needs ffmpeg, plus ffprobe or PyAV for probing. Closed GOPs are
+    # assumed; the result is checked against the source frame count.
+    cancel = cancel or (lambda: False)
+    exe = ffmpeg.require_ffmpeg('Smart rendering')
+    stream = ffmpeg.probe_stream(src)
+    if stream['codec'] not in ENCODERS:
+        raise VideoError(f"Smart rendering does not support {stream['codec']} sources "
+                         f"(supported: {', '.join(sorted(ENCODERS))})")
+    fps = stream['fps']
+    if not fps:
+        raise VideoError(f'Smart rendering needs a known frame rate, none found in {src}')
+    timeline = masks if isinstance(masks, MaskTimeline) else MaskTimeline(masks)
+    keyflags = ffmpeg.probe_packets(src)
+    total = len(keyflags)
+    runs = plan_runs(gop_ranges(keyflags), timeline)
+
+    workdir = tempfile.mkdtemp(prefix='.smart-', dir=os.path.dirname(os.path.abspath(dst)))
+    try:
+        # One stream-copy pass cuts the video at every run boundary
+        pattern = os.path.join(workdir, 'part%05d' + PART_EXT)
+        cuts = ','.join(str(start) for start, _, _ in runs[1:])
+        args = [exe, '-y', '-v', 'error', '-i', src, '-map', '0:v:0', '-c', 'copy',
+                '-f', 'segment', '-reset_timestamps', '1']
+        if cuts:
+            args += ['-segment_frames', cuts]
+        ffmpeg.run(args + [pattern])
+        parts = [pattern % i for i in range(len(runs))]
+        if not all(os.path.exists(p) for p in parts) or os.path.exists(pattern % len(runs)):
+            raise VideoError('Stream copy did not split on the expected keyframes')
+
+        engine = make_engine(**engine_options)
+        plans = engine.compile_timeline(timeline, (stream['width'], stream['height']))
+        done = sum(end - start for start, end, dirty in runs if not dirty)
+        passed = 0
+        tracker = ProgressTracker(total, [progress], progress_interval)
+        tracker.set_done(done)
+        for i, (start, end, dirty) in enumerate(runs):
+            if not dirty:
+                continue
+            if cancel():
+                return ProcessResult(done, total, True, passed, engine.stats(), tracker.snapshot())
+            cap, info = open_video(parts[i])
+            encoded = os.path.join(workdir, f'enc{i:05d}{PART_EXT}')
+            out = ffmpeg.FFmpegWriter(encoded, info.size, fps,
+                                      ENCODERS[stream['codec']] + ['-pix_fmt', stream['pix_fmt'] or 'yuv420p',
+                                                                   '-f', PART_FORMAT])
+            try:
+                pipeline = FramePipeline(engine, plans, workers=workers, backend=backend,
+                                         max_memory_mb=max_memory_mb, telemetry=telemetry)
+                frames = pipeline.run(cap, out, end - start, cancel=cancel,
+                                      tracker=tracker, start=start)
+            finally:
+                cap.release()
+                out.release()
+            if frames != end - start and not cancel():
+                raise VideoError(f'Frames {start}-{end} decoded {frames} of {end - start} frames')
+            done += frames
+            passed += pipeline.passed_through
+            parts[i] = encoded
+
+        if cancel():
+            return ProcessResult(done, total, True, passed, engine.stats(), tracker.snapshot())
+        ffmpeg.concat(parts, dst, [(end - start) / fps for start, end, _ in runs])
+        if verify:
+            verify_output(src, dst, total, fps)
+        tracker.set_done(total)
+        return ProcessResult(total, total, False, passed + total - sum(
+            end - start for start, end, dirty in runs if dirty), engine.stats(), tracker.snapshot())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
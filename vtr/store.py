@@ -0,0 +1,48 @@
+import hashlib
+import json
+import os
+
+
+def cache_dir():
+    # VTR_CACHE_DIR, else the per-user cache folder of the platform
+    root = os.environ.get('VTR_CACHE_DIR')
+    if root:
+        return root
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'vtr')
+
+
+def file_key(path, *parts):
+    # Changes when the file is replaced or modified, or any part changes
+    st = os.stat(path)
+    data = json.dumps([os.path.abspath(path), st.st_size, st.st_mtime_ns, *parts],
+                      sort_keys=True, default=str)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def _path(kind, key):
+    return os.path.join(cache_dir(), kind, key + '.json')
+
+
+def load(kind, key):
+    try:
+        with open(_path(kind, key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save(kind, key, data):
+    # Best effort: a read-only or full disk only costs the cache
+    path = _path(kind, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
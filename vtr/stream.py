@@ -0,0 +1,241 @@
+import argparse
+import json
+import signal
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+from .algorithms import ALGORITHMS, DEFAULT_ALGORITHM
+from .cache import DEFAULT_CACHE_SIZE
+from .cli import EXIT_CANCELLED, EXIT_FAILED, EXIT_OK, EXIT_USAGE, load_masks, parse_rect
+from .engine import INPAINT_RADIUS, InpaintEngine
+from .pipeline import FramePipeline
+from .processing import ProcessResult, VideoError, make_engine
+from .progress import DEFAULT_INTERVAL, ProgressTracker
+from .pyramid import DEFAULT_SCALE
+
+# Raw pixel formats, named as in ffmpeg's -pix_fmt, with the conversions
+# to and from the BGR frames the engine works on (None: already BGR)
+PIX_FMTS = {
+    'bgr24': (None, None),
+    'rgb24': (cv2.COLOR_RGB2BGR, cv2.COLOR_BGR2RGB),
+    'bgra': (cv2.COLOR_BGRA2BGR, cv2.COLOR_BGR2BGRA),
+    'gray': (cv2.COLOR_GRAY2BGR, cv2.COLOR_BGR2GRAY),
+    'yuv420p': (cv2.COLOR_YUV2BGR_I420, cv2.COLOR_BGR2YUV_I420),
+}
+DEFAULT_PIX_FMT = 'bgr24'
+
+
+def frame_shape(width, height, pix_fmt):
+    # Shape of one raw frame as a uint8 array
+    if pix_fmt not in PIX_FMTS:
+        raise VideoError(f"Unsupported pixel format: {pix_fmt} (supported: {', '.join(PIX_FMTS)})")
+    if pix_fmt == 'yuv420p':
+        if width % 2 or height % 2:
+            raise VideoError(f'yuv420p needs an even frame size, got {width}x{height}')
+        return height * 3 // 2, width
+    if pix_fmt == 'gray':
+        return height, width
+    return height, width, 4 if pix_fmt == 'bgra' else 3
+
+
+def open_stream(path, mode):
+    # '-' is stdin or stdout; anything else is a file or named pipe. Opening
+    # a named pipe blocks until the other end is opened.
+    if path == '-':
+        return (sys.stdin if mode == 'r' else sys.stdout).buffer, False
+    return open(path, mode + 'b'), True
+
+
+class RawVideoReader:
+    # cv2.VideoCapture-like read() over a stream of raw frames. Like
+    # VideoCapture.read(image), it decodes into `image` when given one (a
+    # pooled frame); otherwise every frame gets a new array, since frames
+    # stay in flight in the pipeline after read() returns.
+    def __init__(self, stream, width, height, pix_fmt=DEFAULT_PIX_FMT, close=False):
+        self.stream = stream
+        self.shape = frame_shape(width, height, pix_fmt)
+        self.frame_bytes = int(np.prod(self.shape))
+        self.convert = PIX_FMTS[pix_fmt][0]
+        # Converted formats are read into one reused buffer
+        self._raw = np.empty(self.shape, np.uint8) if self.convert is not None else None
+        self.close = close
+
+    def _fill(self, array):
+        view = memoryview(array).cast('B')
+        got = 0
+        # Pipes return short reads, so keep reading until the frame is full
+        while got < self.frame_bytes:
+            n = self.stream.readinto(view[got:])
+            if not n:
+                break
+            got += n
+        if 0 < got < self.frame_bytes:
+            raise VideoError(f'Input ended inside a frame ({got} of {self.frame_bytes} bytes)')
+        return got > 0
+
+    def read(self, image=None):
+        if self.convert is not None:
+            if not self._fill(self._raw):
+                return False, None
+            return True, cv2.cvtColor(self._raw, self.convert, dst=image)
+        if image is None or image.shape != self.shape:
+            image = np.empty(self.shape, np.uint8)
+        if not self._fill(image):
+            return False, None
+        return True, image
+
+    def release(self):
+        if self.close:
+            self.stream.close()
+
+
+class RawVideoWriter:
+    def __init__(self, stream, width, height, pix_fmt=DEFAULT_PIX_FMT, close=False):
+        self.stream = stream
+        frame_shape(width, height, pix_fmt)
+        self.convert = PIX_FMTS[pix_fmt][1]
+        self.close = close
+
+    def write(self, frame):
+        if self.convert is not None:
+            frame = cv2.cvtColor(frame, self.convert)
+        self.stream.write(np.ascontiguousarray(frame).data)
+
+    def release(self):
+        try:
+            self.stream.flush()
+        finally:
+            if self.close:
+                self.stream.close()
+
+
+def process_stream(src, dst, masks, width, height, pix_fmt=DEFAULT_PIX_FMT, output_pix_fmt=None,
+                   frames=0, workers=None, backend='thread', buffer_frames=None, cancel=None,
+                   progress=None, progress_interval=DEFAULT_INTERVAL, max_memory_mb=None,
+                   telemetry=None, **engine_options):
+    # Reads raw frames from src and writes the processed frames to dst, both
+    # paths, named pipes or '-' for stdin/stdout, until the input ends.
+    # Nothing touches the disk in between. buffer_frames bounds the frames
+    # waiting for and leaving the workers (default twice the workers), so
+    # memory stays under about 2 * buffer_frames + workers frames. frames is
+    # the expected count, for progress only (0: unknown). YUV input goes
+    # through BGR, so unmasked pixels may change by a rounding step.
+    cancel = cancel or (lambda: False)
+    engine = make_engine(**engine_options)
+    plans = engine.compile_timeline(masks, (width, height))
+    stream, close = open_stream(src, 'r')
+    cap = RawVideoReader(stream, width, height, pix_fmt, close)
+    try:
+        stream, close = open_stream(dst, 'w')
+        out = RawVideoWriter(stream, width, height, output_pix_fmt or pix_fmt, close)
+        try:
+            tracker = ProgressTracker(frames, [progress], progress_interval)
+            pipeline = FramePipeline(engine, plans, workers=workers, backend=backend,
+                                     queue_size=buffer_frames, max_memory_mb=max_memory_mb,
+                                     telemetry=telemetry)
+            written = pipeline.run(cap, out, None, cancel=cancel, tracker=tracker)
+        finally:
+            out.release()
+    finally:
+        cap.release()
+    return ProcessResult(written, frames or written, cancel(), pipeline.passed_through,
+                         engine.stats(), tracker.snapshot())
+
+
+def parse_size(text):
+    try:
+        width, height = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected WIDTHxHEIGHT, got {text!r}')
+    return width, height
+
+
+def emit(event, **fields):
+    # stdout may carry the video, so events go to stderr
+    sys.stderr.write(json.dumps(dict(event=event, **fields)) + '\n')
+    sys.stderr.flush()
+
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog='python -m vtr.stream',
+        description='Remove text from a raw video stream, e.g. between an ffmpeg decoder and '
+                    'encoder. Frames are read from stdin or a named pipe and written to stdout '
+                    'or a named pipe; JSON events go to stderr.')
+    p.add_argument('-i', '--input', default='-', help='raw input, - for stdin (default)')
+    p.add_argument('-o', '--output', default='-', help='raw output, - for stdout (default)')
+    p.add_argument('-s', '--size', type=parse_size, required=True, metavar='WxH')
+    p.add_argument('--pix-fmt', choices=list(PIX_FMTS), default=DEFAULT_PIX_FMT)
+    p.add_argument('--output-pix-fmt', choices=list(PIX_FMTS),
+                   help='pixel format written (default: same as --pix-fmt)')
+    p.add_argument('--frames', type=int, default=0,
+                   help='expected frame count, used for progress percent and ETA only')
+    p.add_argument('-r', '--rect', action='append', type=parse_rect, default=[],
+                   metavar='X1,Y1,X2,Y2', help='mask rectangle in video pixels, repeatable')
+    p.add_argument('-m', '--masks', help='JSON or YAML file with mask rectangles')
+    p.add_argument('--mode', choices=InpaintEngine.MODES, default='roi')
+    p.add_argument('--algorithm', choices=list(ALGORITHMS), default=DEFAULT_ALGORITHM)
+    p.add_argument('--radius', type=int, default=INPAINT_RADIUS)
+    p.add_argument('--pyramid-scale', type=float, default=DEFAULT_SCALE)
+    p.add_argument('--pyramid-band', type=int)
+    p.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE)
+    p.add_argument('--cache-tolerance', type=float, default=0.0)
+    p.add_argument('-j', '--workers', type=int, help='inpaint workers (default: CPU count)')
+    p.add_argument('--backend', choices=FramePipeline.BACKENDS, default='thread')
+    p.add_argument('--buffer-frames', type=int,
+                   help='frames queued before and after the workers (default: twice the workers)')
+    p.add_argument('--max-memory', type=float, metavar='MB',
+                   help='cap on the memory taken by frames in flight')
+    p.add_argument('--progress-interval', type=float, default=1.0)
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    masks = list(args.rect)
+    if args.masks:
+        try:
+            masks += load_masks(args.masks)
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            emit('error', message=f'Could not load masks: {e}')
+            return EXIT_USAGE
+    if not masks:
+        emit('error', message='No mask rectangles given (use --rect or --masks)')
+        return EXIT_USAGE
+
+    cancelled = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: cancelled.set())
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, lambda *_: cancelled.set())
+
+    def on_progress(snap):
+        emit('progress', frame=snap['done'], total=snap['total'] or None,
+             fps=round(snap['fps'], 2))
+
+    width, height = args.size
+    try:
+        result = process_stream(args.input, args.output, masks, width, height,
+                                pix_fmt=args.pix_fmt, output_pix_fmt=args.output_pix_fmt,
+                                frames=args.frames, workers=args.workers, backend=args.backend,
+                                buffer_frames=args.buffer_frames, max_memory_mb=args.max_memory,
+                                cancel=cancelled.is_set,
+                                progress=on_progress, progress_interval=args.progress_interval,
+                                mode=args.mode, algorithm=args.algorithm, radius=args.radius,
+                                cache_size=args.cache_size, cache_tolerance=args.cache_tolerance,
+                                pyramid_scale=args.pyramid_scale, pyramid_band=args.pyramid_band)
+    except (OSError, VideoError, ValueError) as e:
+        emit('error', message=str(e))
+        return EXIT_FAILED
+    if result.cancelled:
+        emit('cancelled', frame=result.frames)
+        return EXIT_CANCELLED
+    emit('done', frames=result.frames, passed_through=result.passed_through, **result.stats,
+         fps=round(result.timing.get('fps', 0.0), 2), peak_rss_mb=result.peak_rss_mb)
+    return EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
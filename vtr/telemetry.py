@@ -0,0 +1,178 @@
+import cProfile
+import json
+import pstats
+import threading
+from bisect import bisect_left
+
+from .progress import STAGES
+
+# Histogram bucket upper bounds in ms: four per doubling (each about 19%
+# wide) from 10 us to about 84 s
+BUCKETS_MS = tuple(0.01 * 2 ** (i / 4) for i in range(93))
+
+
+class Histogram:
+    # Per-frame times of one stage in log-spaced buckets, so percentiles
+    # cost no memory per frame. Percentiles are interpolated within their
+    # bucket and capped at the slowest frame.
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank, seen = q / 100 * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS_MS[i - 1] if i else 0.0
+                high = min(BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max, self.max)
+                return max(min(low + (high - low) * (rank - seen) / n, self.max), 0.0)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            'frames': self.count,
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50), 3),
+            'p95_ms': round(self.percentile(95), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max, 3),
+            'buckets': {f'{BUCKETS_MS[i]:.3g}' if i < len(BUCKETS_MS) else 'inf': n
+                        for i, n in enumerate(self.counts) if n},
+        }
+
+
+class Telemetry:
+    # Opt-in instrumentation of a processing run, passed to the renderers as
+    # telemetry=. Collects a histogram per pipeline stage and one record per
+    # frame (stage times, masked pixels, ROIs served from the inpaint cache),
+    # written as JSON lines to `trace` when given. With `profile`, the
+    # pipeline's decode, encode and worker threads run under cProfile and
+    # close() writes the merged stats there (pstats format, for snakeviz or
+    # python -m pstats). keep=True also keeps the records in .records.
+    # Without a Telemetry the pipeline skips all of this.
+    def __init__(self, trace=None, profile=None, keep=False):
+        self.trace = trace
+        self.profile = profile
+        self.keep = keep
+        self.running = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._reset()
+
+    def _reset(self):
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        self.frames = 0
+        self.masked_pixels = 0
+        self.cache_hits = 0
+        self.records = [] if self.keep else None
+        self._profiles = []
+        self._trace_file = None
+
+    def _begin(self):
+        # A run starts with its first frame or profiled call, so a retried
+        # job starts over instead of adding to the failed attempt
+        with self._lock:
+            if not self.running:
+                self._reset()
+                if self.trace:
+                    self._trace_file = open(self.trace, 'w')
+                self.running = True
+
+    def frame(self, record):
+        # record: 'frame' index, seconds per stage, 'masked_px' and, with an
+        # inpaint cache, 'cache_hits'. Called by the writer.
+        self._begin()
+        line = {'frame': record['frame']}
+        for stage in STAGES:
+            if stage in record:
+                ms = record[stage] * 1000
+                self.histograms[stage].add(ms)
+                line[stage + '_ms'] = round(ms, 3)
+        for key in ('masked_px', 'rois', 'cache_hits'):
+            if key in record:
+                line[key] = record[key]
+        with self._lock:
+            self.frames += 1
+            self.masked_pixels += record.get('masked_px', 0)
+            self.cache_hits += record.get('cache_hits', 0)
+            if self.records is not None:
+                self.records.append(record)
+            if self._trace_file:
+                self._trace_file.write(json.dumps(line) + '\n')
+
+    def profiled(self, fn):
+        # fn, run under its calling thread's profiler when profiling
+        if not self.profile:
+            return fn
+
+        def run(*args, **kwargs):
+            self._begin()
+            prof = getattr(self._local, 'profile', None)
+            if prof is None or prof not in self._profiles:
+                prof = self._local.profile = cProfile.Profile()
+                with self._lock:
+                    self._profiles.append(prof)
+            try:
+                prof.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler; it already sees
+                # every thread
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                prof.disable()
+        return run
+
+    def close(self):
+        # Ends the run: closes the trace and writes the profile
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+            if self._trace_file:
+                self._trace_file.close()
+                self._trace_file = None
+            profiles = [p for p in self._profiles if p.getstats()]
+        if self.profile and profiles:
+            pstats.Stats(*profiles).dump_stats(self.profile)
+
+    def summary(self):
+        summary = {
+            'frames': self.frames,
+            'masked_px_per_frame': round(self.masked_pixels / self.frames) if self.frames else 0,
+            'stages': {stage: h.summary() for stage, h in self.histograms.items() if h.count},
+        }
+        if self.cache_hits:
+            summary['cache_hits'] = self.cache_hits
+        if self.trace:
+            summary['trace'] = self.trace
+        if self.profile:
+            summary['profile'] = self.profile
+        return summary
+
+
+def format_summary(summary):
+    # Lines for logs: one per stage, slowest stage first
+    lines = [f"{summary['frames']} frames traced, "
+             f"{summary['masked_px_per_frame']} masked pixels per frame"
+             + (f", {summary['cache_hits']} cached ROIs" if 'cache_hits' in summary else '')]
+    stages = sorted(summary['stages'].items(), key=lambda item: -item[1]['mean_ms'])
+    for stage, s in stages:
+        lines.append(f"{stage}: mean {s['mean_ms']:.2f} ms, p50 {s['p50_ms']:.2f}, "
+                     f"p95 {s['p95_ms']:.2f}, p99 {s['p99_ms']:.2f}, max {s['max_ms']:.2f}")
+    for key in ('trace', 'profile'):
+        if key in summary:
+            lines.append(f'{key} written to {summary[key]}')
+    return lines
@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+
+# Mean absolute difference on pixels known in the model above which the
+# background is treated as changed (camera move or scene cut)
+SCENE_THRESHOLD = 12.0
+
+
+class TemporalFill:
+    # Rolling last-known-clean background model for the mask ROIs of a
+    # static shot. Unmasked pixels of every frame, and whole ROIs on frames
+    # with no active mask, update the model; masked pixels are filled from
+    # it, and only pixels never seen uncovered fall back to spatial inpaint.
+    # Frames must be fed in order.
+    def __init__(self, radius, inpaint, threshold=SCENE_THRESHOLD):
+        # inpaint is a vtr.algorithms function, used for never-seen pixels
+        self.radius = radius
+        self.inpaint = inpaint
+        self.threshold = threshold
+        self.bg = None
+        self.known = None
+        self.regions = {}
+        self.filled = self.inpainted = 0
+
+    def track(self, boxes, frame_size, channels=3):
+        # Registers (x1, y1, x2, y2) regions to model before any mask is
+        # active, so clean frames ahead of a caption are learned too
+        if self.bg is None:
+            w, h = frame_size
+            self.bg = np.zeros((h, w, channels), dtype=np.uint8)
+            self.known = np.zeros((h, w), dtype=bool)
+        for x1, y1, x2, y2 in boxes:
+            self.regions[(y1, y2, x1, x2)] = (slice(y1, y2), slice(x1, x2))
+
+    def _update(self, crop, bg, known, clean):
+        # Reset the region if the pixels visible in both differ too much
+        both = clean & known
+        if both.any() and cv2.absdiff(crop, bg)[both].mean() > self.threshold:
+            known[...] = False
+        bg[clean] = crop[clean]
+        known |= clean
+
+    def observe(self, frame):
+        # A frame without an active mask: every tracked region is background
+        if self.bg is None:
+            return frame
+        for sy, sx in self.regions.values():
+            crop, known = frame[sy, sx], self.known[sy, sx]
+            self._update(crop, self.bg[sy, sx], known, np.ones(known.shape, dtype=bool))
+        return frame
+
+    def apply(self, frame, plan):
+        if self.bg is None:
+            # Not set up by track() (a plain MaskPlan): model this plan's ROIs
+            h, w = frame.shape[:2]
+            self.track([(sx.start, sy.start, sx.stop, sy.stop) for sy, sx, _ in plan.rois],
+                       (w, h), frame.shape[2])
+        for sy, sx, mask in plan.rois:
+            crop, bg, known = frame[sy, sx], self.bg[sy, sx], self.known[sy, sx]
+            masked = mask > 0
+            self._update(crop, bg, known, ~masked)
+
+            fill = masked & known
+            crop[fill] = bg[fill]
+            hole = masked & ~known
+            if hole.any():
+                crop[...] = self.inpaint(crop, hole.view(np.uint8) * 255, self.radius)
+                self.inpainted += 1
+            else:
+                self.filled += 1
+        return frame
@@ -0,0 +1,128 @@
+import hashlib
+import json
+from bisect import bisect_right
+from collections import OrderedDict
+
+from .plan import MaskPlan, normalize_rect
+
+
+class Mask:
+    # A rectangle in video pixels, active on frames start <= f < end
+    # (end=None means until the last frame). Keyframes are (frame, rect)
+    # pairs; between them the position is linearly interpolated and outside
+    # them the nearest keyframe is held.
+    def __init__(self, rect, start=0, end=None, keyframes=None):
+        self.rect = tuple(normalize_rect(rect))
+        self.start = max(int(start), 0)
+        self.end = None if end is None else int(end)
+        self.keyframes = sorted((int(f), tuple(normalize_rect(r))) for f, r in (keyframes or []))
+
+    def active(self, frame):
+        return self.start <= frame and (self.end is None or frame < self.end)
+
+    def rect_at(self, frame):
+        kf = self.keyframes
+        if not kf:
+            return self.rect
+        i = bisect_right(kf, (frame, (float('inf'),) * 4))
+        if i == 0:
+            return kf[0][1]
+        if i == len(kf):
+            return kf[-1][1]
+        (f0, r0), (f1, r1) = kf[i-1], kf[i]
+        t = (frame - f0) / (f1 - f0)
+        return tuple(int(round(a + (b - a) * t)) for a, b in zip(r0, r1))
+
+    def to_dict(self):
+        d = {'rect': list(self.rect), 'start': self.start, 'end': self.end}
+        if self.keyframes:
+            d['keyframes'] = [[f, list(r)] for f, r in self.keyframes]
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['rect'], d.get('start', 0), d.get('end'), d.get('keyframes'))
+
+
+class MaskTimeline:
+    # Interval index over the masks: the boundaries where the active set
+    # changes, and the active mask indices for each span between them
+    def __init__(self, masks):
+        self.masks = [m if isinstance(m, Mask) else Mask(m) for m in masks]
+        points = {0}
+        for m in self.masks:
+            points.add(m.start)
+            if m.end is not None:
+                points.add(m.end)
+        self.bounds = sorted(points)
+        self.active_sets = [tuple(i for i, m in enumerate(self.masks) if m.active(b))
+                            for b in self.bounds]
+
+    def active(self, frame):
+        return self.active_sets[bisect_right(self.bounds, frame) - 1]
+
+    def fingerprint(self):
+        # Stable hash of every mask's range, rect and keyframes
+        data = json.dumps([m.to_dict() for m in self.masks], sort_keys=True)
+        return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+    def rects_at(self, frame):
+        return tuple(self.masks[i].rect_at(frame) for i in self.active(frame))
+
+    def spans(self, total):
+        # (start, end, active mask indices) covering [0, total)
+        out = []
+        for i, b in enumerate(self.bounds):
+            if b >= total:
+                break
+            end = self.bounds[i+1] if i + 1 < len(self.bounds) else total
+            out.append((b, min(end, total), self.active_sets[i]))
+        return out
+
+    def any_active(self, start, end):
+        # True if some mask is active on a frame in [start, end)
+        i = bisect_right(self.bounds, start) - 1
+        while i < len(self.bounds) and self.bounds[i] < end:
+            if self.active_sets[i]:
+                return True
+            i += 1
+        return False
+
+    def extents(self, frame_size, pad=0):
+        # Padded bounding box of everywhere each mask can be, clamped to the frame
+        w, h = frame_size
+        boxes = []
+        for m in self.masks:
+            rects = [r for _, r in m.keyframes] or [m.rect]
+            x1, y1 = min(r[0] for r in rects), min(r[1] for r in rects)
+            x2, y2 = max(r[2] for r in rects), max(r[3] for r in rects)
+            boxes.append((max(x1-pad, 0), max(y1-pad, 0), min(x2+pad, w), min(y2+pad, h)))
+        return boxes
+
+    def masked_frames(self, total):
+        return sum(e - s for s, e, active in self.spans(total) if active)
+
+
+class TimelinePlan:
+    # Per-frame MaskPlans for a timeline. Frames with no active mask get
+    # None so callers can pass them through; plans are cached by their
+    # rectangles, so static spans compile once.
+    def __init__(self, timeline, frame_size, pad, cache_size=64):
+        self.timeline = timeline
+        self.frame_size = frame_size
+        self.pad = pad
+        self.cache_size = cache_size
+        self._plans = OrderedDict()
+
+    def plan_for(self, idx):
+        rects = self.timeline.rects_at(idx)
+        if not rects:
+            return None
+        plan = self._plans.get(rects)
+        if plan is None:
+            plan = self._plans[rects] = MaskPlan(rects, self.frame_size, self.pad)
+            if len(self._plans) > self.cache_size:
+                self._plans.popitem(last=False)
+        else:
+            self._plans.move_to_end(rects)
+        return plan if plan.rects else None
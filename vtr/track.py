@@ -0,0 +1,190 @@
+import cv2
+import numpy as np
+
+from .index import load_index, seek
+from .plan import normalize_rect
+from .processing import open_video
+from .progress import DEFAULT_INTERVAL, ProgressTracker
+from .timeline import Mask
+
+TRACKERS = ('template', 'kcf', 'csrt')
+MIN_SCORE = 0.5        # template match score below which the text is lost
+REFRESH_SCORE = 0.9    # below this the template is re-cut from the new position
+TOLERANCE = 1          # pixels a kept keyframe's interpolation may be off by
+BACK_CHUNK = 16        # frames read at a time when tracking backwards
+
+
+class TemplateTracker:
+    # Normalised cross-correlation of the text's first appearance inside a
+    # search window around its last position. Same init/update interface as
+    # OpenCV's trackers; boxes are (x, y, w, h).
+    def __init__(self, search=None, min_score=MIN_SCORE):
+        self.search = search
+        self.min_score = min_score
+
+    def _gray(self, frame, x1, y1, x2, y2):
+        return cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+
+    def init(self, frame, box):
+        x, y, w, h = box
+        self.box = box
+        self.template = self._gray(frame, x, y, x + w, y + h)
+
+    def update(self, frame):
+        x, y, w, h = self.box
+        fh, fw = frame.shape[:2]
+        s = self.search or max(16, max(w, h) // 2)
+        x1, y1 = max(x - s, 0), max(y - s, 0)
+        x2, y2 = min(x + w + s, fw), min(y + h + s, fh)
+        if x2 - x1 < w or y2 - y1 < h:
+            return False, self.box
+        scores = cv2.matchTemplate(self._gray(frame, x1, y1, x2, y2), self.template,
+                                   cv2.TM_CCOEFF_NORMED)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+        if score < self.min_score:
+            return False, self.box
+        self.box = (x1 + dx, y1 + dy, w, h)
+        if score < REFRESH_SCORE:
+            # Follows slow changes in the text's look without drifting on
+            # every frame
+            self.template = self._gray(frame, x1 + dx, y1 + dy, x1 + dx + w, y1 + dy + h)
+        return True, self.box
+
+
+def make_tracker(method):
+    if method == 'template':
+        return TemplateTracker()
+    if method not in TRACKERS:
+        raise ValueError(f"Unknown tracker: {method} (available: {', '.join(TRACKERS)})")
+    name = f'Tracker{method.upper()}_create'
+    for module in (cv2, getattr(cv2, 'legacy', None)):
+        if module is not None and hasattr(module, name):
+            return getattr(module, name)()
+    raise ValueError(f'The {method.upper()} tracker needs opencv-contrib-python')
+
+
+def _to_rect(box, frame_size):
+    x, y, w, h = (int(round(v)) for v in box)
+    fw, fh = frame_size
+    return (max(x, 0), max(y, 0), min(x + w, fw), min(y + h, fh))
+
+
+def _plausible(prev, box, frame_size):
+    # KCF/CSRT report success after jumping to a similar-looking area or
+    # while shrinking onto the background; treat that as losing the text
+    x, y, w, h = box
+    px1, py1, px2, py2 = prev
+    pw, ph = px2 - px1, py2 - py1
+    if not (0.67 * pw <= w <= 1.5 * pw and 0.67 * ph <= h <= 1.5 * ph):
+        return False
+    # Per-frame moves beyond twice the text height are jumps, not motion
+    limit = 2 * min(pw, ph)
+    if abs(x + w / 2 - (px1 + px2) / 2) > limit or abs(y + h / 2 - (py1 + py2) / 2) > limit:
+        return False
+    fw, fh = frame_size
+    return x >= -w / 2 and y >= -h / 2 and x + w / 2 <= fw and y + h / 2 <= fh
+
+
+def simplify_track(track, tolerance=TOLERANCE):
+    # Drops the (frame, rect) points of a consecutive track that linear
+    # interpolation between the kept ones reproduces within tolerance, so a
+    # steady scroll needs two keyframes instead of one per frame
+    frames = np.array([f for f, _ in track], np.float64)
+    rects = np.array([r for _, r in track], np.float64)
+
+    def fits(i, j):
+        t = (frames[i:j+1] - frames[i]) / (frames[j] - frames[i])
+        interp = rects[i] + (rects[j] - rects[i]) * t[:, None]
+        return np.abs(np.round(interp) - rects[i:j+1]).max() <= tolerance
+
+    keep, i = [0], 0
+    while i < len(track) - 1:
+        j = i + 1
+        while j + 1 < len(track) and fits(i, j + 1):
+            j += 1
+        keep.append(j)
+        i = j
+    return [track[k] for k in keep]
+
+
+def track_mask(path, rect, frame, start=0, end=None, method='template', tolerance=TOLERANCE,
+               cancel=None, progress=None, progress_interval=DEFAULT_INTERVAL):
+    # Follows the text inside rect (video pixels, as seen on `frame`)
+    # forward and backward within [start, end) until the tracker loses it,
+    # and returns a Mask active on the tracked frames whose keyframes give
+    # its position on each of them
+    cancel = cancel or (lambda: False)
+    x1, y1, x2, y2 = normalize_rect(rect)
+    if x2 - x1 < 4 or y2 - y1 < 4:
+        raise ValueError('Mask is too small to track')
+    cap, info = open_video(path)
+    try:
+        # Exact frame count and seeks, so positions match the navigator's frames
+        index = load_index(path, cancel)
+        total = index.frame_count if index else info.frame_count
+        end = min(end or total, total) if total else end
+        tracker_progress = ProgressTracker(max((end or frame + 1) - start, 1), [progress],
+                                           progress_interval)
+        seek(cap, index, frame)
+        ret, anchor = cap.read()
+        if not ret:
+            raise ValueError(f'Could not read frame {frame}')
+        box = (x1, y1, x2 - x1, y2 - y1)
+        positions = {frame: (x1, y1, x2, y2)}
+
+        tracker = make_tracker(method)
+        tracker.init(anchor, box)
+        idx = frame + 1
+        while (end is None or idx < end) and not cancel():
+            ret, image = cap.read()
+            if not ret:
+                break
+            ok, found = tracker.update(image)
+            if not ok or not _plausible(positions[idx - 1], found, info.size):
+                break
+            positions[idx] = _to_rect(found, info.size)
+            tracker_progress.set_done(len(positions))
+            idx += 1
+
+        # Backwards in chunks: seek, decode a few frames, walk them in reverse
+        tracker = make_tracker(method)
+        tracker.init(anchor, box)
+        chunk_end, lost = frame, False
+        while chunk_end > start and not lost and not cancel():
+            chunk_start = max(start, chunk_end - BACK_CHUNK)
+            seek(cap, index, chunk_start)
+            images = []
+            for _ in range(chunk_end - chunk_start):
+                ret, image = cap.read()
+                if not ret:
+                    break
+                images.append(image)
+            if len(images) < chunk_end - chunk_start:
+                break
+            for offset in range(len(images) - 1, -1, -1):
+                ok, found = tracker.update(images[offset])
+                if not ok or not _plausible(positions[chunk_start + offset + 1], found, info.size):
+                    lost = True
+                    break
+                positions[chunk_start + offset] = _to_rect(found, info.size)
+            tracker_progress.set_done(len(positions))
+            chunk_end = chunk_start
+    finally:
+        cap.release()
+
+    track = sorted(positions.items())
+    keyframes = simplify_track(track, tolerance) if len(track) > 1 else []
+    return Mask(positions[frame], track[0][0], track[-1][0] + 1, keyframes)
+
+
+def track_masks(path, masks, method='template', cancel=None):
+    # Tracks every plain mask from its first frame (its rect is the text's
+    # position there). Masks that already have keyframes are kept as-is.
+    out = []
+    for m in masks:
+        m = m if isinstance(m, Mask) else Mask(m)
+        if m.keyframes or (cancel and cancel()):
+            out.append(m)
+            continue
+        out.append(track_mask(path, m.rect, m.start, m.start, m.end, method, cancel=cancel))
+    return out